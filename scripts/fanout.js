@@ -0,0 +1,9 @@
+// три независимых запроса: могут выполняться одновременно
+var user = API.users.get({"user_ids": [1]});
+var photos = API.photos.search({"q": "Nature", "count": 5});
+var wall = API.wall.get({"owner_id": 1, "count": 2});
+
+// запрос, зависящий от результата первого
+var friends = API.friends.get({"user_id": user[0].id});
+
+return {"user": user, "photos": photos.count, "wall": wall.count, "friends": friends.count};
@@ -0,0 +1,117 @@
+import argparse, glob, json, os, platform, statistics, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import vkscript, vkscript.lexer as lexer, vkscript.parser as parser, vkscript.compiler as compiler, vkscript.runtime as runtime, vkscript.encoder as encoder
+
+def deep_nesting(depth=150):
+    expr = '('*depth+'1'+' + 1)'*depth
+    blocks = ''.join('if (i < %d) {'%(j + 10) for j in range(depth // 3))+'i = i + 1;'+'}'*(depth // 3)
+    return 'var i = 0;\nvar x = '+expr+';\n'+blocks+'\nreturn [x, i];'
+
+def long_source(n=700):
+    return 'var a = 0, b = 1;\n'+''.join('a = a + %d * b; b = b | %d;\n'%(i, i & 7) for i in range(n))+'return a;'
+
+def long_expression(n):
+    return 'var a = 1, b = 2;\nreturn '+' '.join('a %s'%'+*-|<'[i % 5] for i in range(n))+' b;'
+
+def array_10k(n=5000):
+    return 'var a = ['+', '.join(map(str, range(n)))+'];\nreturn [a.length, a[%d], Args.data.length];'%(n - 1)
+
+def string_loop(n=500):
+    return 'var s = "", i = 0;\nwhile (i < %d) { s = s + "ab" + i; i = i + 1; }\nreturn s.length;'%n
+
+def array_ops(n=300):
+    return 'var a = [], i = 0;\nwhile (i < %d) { a.push(i); i = i + 1; }\nvar b = a.slice(%d);\nwhile (i > 0) { a.pop(); i = i - 1; }\nreturn [a.length, b];'%(n, n - 3)
+
+def deep_args(depth=5000):
+    ans = []
+    for i in range(depth): ans = [ans, {'i': i}]
+    return {'data': ans}
+
+def op_limit():
+    return 'var i = 0;\nwhile (1) i = i + 1;\nreturn i;'
+
+ARGS = {'data': list(range(10000)), 'user': {'id': 1, 'name': 'x' * 100}}
+
+def workloads():
+    ans = {'deep_nesting': (deep_nesting(), {}), 'long_source': (long_source(), {}), 'long_expr_1k': (long_expression(1000), {}), 'long_expr_4k': (long_expression(4000), {}), 'array_10k': (array_10k(), ARGS), 'string_loop': (string_loop(), {}), 'array_ops': (array_ops(), {}), 'deep_args': ('return Args.data;', deep_args()), 'op_limit': (op_limit(), {})}
+    for i in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts', '*.js'))):
+        ans['script_'+os.path.basename(i)[:-3]] = (open(i).read(), {})
+    return ans
+
+def rpc(method, params):
+    return {'count': 3, 'items': [{'id': i, 'owner_id': i, 'last_name': 'x'} for i in range(3)]}
+
+def execute(code, args):
+    try: return runtime.execute(code, args, rpc, False)
+    except runtime.VKRuntimeError as e: return str(e)
+
+def stages(src, args):
+    code = compiler.compile(src)
+    result = execute(code, args)
+    return {
+        'lex': (lambda: src, lexer.lex),
+        'parse': (lambda: lexer.lex(src), parser.parse),
+        'compile': (lambda: parser.parse(src), compiler.compile),
+        'execute': (lambda: code, lambda code: execute(code, args)),
+        'convert': (lambda: [args, result], lambda x: runtime.vkcell_to_outer(runtime.outer_to_vkcell(x))),
+        'encode': (lambda: runtime.outer_to_vkcell([args, result]), encoder.dumps),
+    }
+
+def measure(setup, fn, repeat, mintime):
+    number = 1
+    while True:
+        args = [setup() for i in range(number)]
+        t = time.perf_counter()
+        for i in args: fn(i)
+        t = time.perf_counter() - t
+        if t >= mintime or number >= 1 << 20: break
+        number *= 2 if t * 10 < mintime else 1 + int(mintime / max(t, 1e-9))
+    times = [t / number]
+    for j in range(repeat - 1):
+        args = [setup() for i in range(number)]
+        t = time.perf_counter()
+        for i in args: fn(i)
+        times.append((time.perf_counter() - t) / number)
+    return {'best': min(times), 'median': statistics.median(times), 'number': number}
+
+def compare(results, baseline, threshold):
+    ans = []
+    for k, v in sorted(results.items()):
+        if k not in baseline: continue
+        ratio = v['best'] / baseline[k]['best']
+        ans.append((k, ratio, ratio > 1 + threshold))
+    return ans
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('filter', nargs='*', help='only run benchmarks whose name contains one of these strings')
+    ap.add_argument('--json', metavar='FILE', help='write results to FILE')
+    ap.add_argument('--baseline', metavar='FILE', help='compare against results saved with --json')
+    ap.add_argument('--threshold', type=float, default=0.1, help='relative slowdown reported as a regression')
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--mintime', type=float, default=0.05, help='minimum seconds per measurement')
+    args = ap.parse_args()
+    results = {}
+    for name, (src, data) in workloads().items():
+        for stage, (setup, fn) in stages(src, data).items():
+            key = name+'/'+stage
+            if args.filter and not any(i in key for i in args.filter): continue
+            results[key] = measure(setup, fn, args.repeat, args.mintime)
+            print('%-32s %10.1fus  (median %.1fus)'%(key, results[key]['best'] * 1e6, results[key]['median'] * 1e6), flush=True)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'python': platform.python_version(), 'time': time.time(), 'results': results}, file, indent=1, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as file: baseline = json.load(file)['results']
+        bad = 0
+        print()
+        for key, ratio, regression in compare(results, baseline, args.threshold):
+            print('%-32s x%.2f%s'%(key, ratio, '  REGRESSION' if regression else ''))
+            bad += regression
+        if bad:
+            print('%d regression(s) over %d%%'%(bad, args.threshold * 100))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import asyncio, os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import vkscript, vkscript.fakeapi as fakeapi
+
+def photos_search(method, params):
+    return {'count': params['count'], 'items': [{'id': i, 'owner_id': 100 + i} for i in range(params['count'])]}
+
+def users_get(method, params):
+    return [{'id': i, 'first_name': 'Ivan', 'last_name': 'User%d'%i} for i in params['user_ids']]
+
+HANDLERS = {'photos.search': photos_search, 'users.get': users_get}
+
+async def run_async(code, n, api):
+    return await asyncio.gather(*(vkscript.async_execute(code, None, api) for i in range(n)))
+
+def main(nscripts=200, latency=0.02):
+    code = vkscript.compile(open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts', 'nature.js')).read())
+    api = fakeapi.FakeAPI(HANDLERS, latency)
+    t = time.perf_counter()
+    for i in range(min(nscripts, 20)): expected = vkscript.execute(code, None, api)
+    sync = (time.perf_counter() - t) / min(nscripts, 20) * nscripts
+    api = fakeapi.AsyncFakeAPI(HANDLERS, latency)
+    t = time.perf_counter()
+    results = asyncio.run(run_async(code, nscripts, api))
+    t = time.perf_counter() - t
+    assert all(i == expected for i in results)
+    print('%d scripts, %d API calls of %.0fms each'%(nscripts, api.calls, latency * 1000))
+    print('sequential: %8.1fms (extrapolated)'%(sync * 1000))
+    print('async:      %8.1fms, %d calls in flight at most'%(t * 1000, api.max_inflight))
+
+if __name__ == '__main__':
+    main(*(f(i) for f, i in zip((int, float), sys.argv[1:])))
@@ -0,0 +1,22 @@
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import vkscript
+
+def gen(nvars, iters):
+    names = ['v%d'%i for i in range(nvars)]
+    return 'var '+', '.join(i+' = ['+str(j)+']' for j, i in enumerate(names))+';\nvar i = 0;\nwhile(i < '+str(iters)+') i = i + 1;\nreturn i;'
+
+def bench(code, checked, repeat):
+    best = None
+    for i in range(repeat):
+        t = time.perf_counter()
+        vkscript.execute(code, None, vkscript.runtime.NoAPI, checked)
+        t = time.perf_counter() - t
+        if best == None or t < best: best = t
+    return best
+
+for nvars in map(int, sys.argv[1:] or (1, 10, 100, 1000)):
+    code = vkscript.compile(gen(nvars, (9000 - 2 * nvars) // 10))
+    fast = bench(code, False, 5)
+    slow = bench(code, True, 5)
+    print('%5d locals: unchecked %8.2fms, checked %8.2fms (x%.1f)'%(nvars, fast * 1000, slow * 1000, slow / fast))
@@ -0,0 +1,59 @@
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import vkscript.lexer as lexer, vkscript.parser as parser
+
+def source(n):
+    return ''.join('var v%d = %d;\nwhile (v%d < 10) {\n    v%d = v%d + 1; // step\n}\nif (v%d) v%d = [v%d, "x"]; else v%d = 0;\n'%((i,) * 9) for i in range(n))
+
+def keystrokes(src, text):
+    pos = src.index('\n', len(src) // 2) + 1
+    for i in range(len(text)):
+        yield pos + i, pos + i, text[i]
+    for i in range(len(text), 0, -1):
+        yield pos + i - 1, pos + i, ''
+
+class Editor:
+    def __init__(self, src):
+        self.src = src
+        self.tree = parser.parse(src)
+        self.dirty = None
+    def edit(self, start, end, text):
+        # keep the last tree that parsed and the range of it that has changed since
+        old = self.tree.pos.code
+        self.src = self.src[:start]+text+self.src[end:]
+        shift = len(self.src) - len(old)
+        if self.dirty == None: lo, hi = start, end
+        else:
+            lo, hi = self.dirty
+            prev = shift - len(text) + end - start
+            lo, hi = min(lo, start), max(hi, end if end < lo else hi if end <= hi + prev else end - prev)
+        try: self.tree = parser.reparse(self.tree, lo, hi, self.src[lo:hi + shift])
+        except lexer.VKSyntaxError as e:
+            self.dirty = (lo, hi)
+            return e
+        self.dirty = None
+
+def main(n=2000):
+    src = source(n)
+    edits = list(keystrokes(src, 'var typed = (v1 + v2) * 3;\n'))
+    print('%d lines, %d keystrokes'%(src.count('\n'), len(edits)))
+    full = []
+    cur = src
+    for start, end, text in edits:
+        cur = cur[:start]+text+cur[end:]
+        t = time.perf_counter()
+        try: parser.parse(cur)
+        except lexer.VKSyntaxError: pass
+        full.append(time.perf_counter() - t)
+    editor = Editor(src)
+    inc = []
+    for start, end, text in edits:
+        t = time.perf_counter()
+        editor.edit(start, end, text)
+        inc.append(time.perf_counter() - t)
+    assert editor.src == cur and repr(editor.tree) == repr(parser.parse(cur))
+    for name, times in (('parse', full), ('reparse', inc)):
+        print('%-8s mean %8.2fms  max %8.2fms'%(name, sum(times) / len(times) * 1000, max(times) * 1000))
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
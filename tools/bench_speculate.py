@@ -0,0 +1,18 @@
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import vkscript, vkscript.fakeapi as fakeapi
+
+def main(latency=0.05, repeat=5):
+    code = vkscript.compile(open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts', 'fanout.js')).read())
+    api = fakeapi.FakeAPI(default={'count': 1, 'items': [{'id': 1}]}, latency=latency)
+    for engine in ('interp', 'speculate'):
+        best = None
+        for i in range(repeat):
+            t = time.perf_counter()
+            vkscript.execute(code, None, api, engine=engine)
+            t = time.perf_counter() - t
+            if best == None or t < best: best = t
+        print('%-10s %8.1fms'%(engine, best * 1000))
+
+if __name__ == '__main__':
+    main(*map(float, sys.argv[1:2]))
@@ -0,0 +1,43 @@
+import glob, os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import vkscript, vkscript.runtime as runtime, vkscript.bytecode as bytecode
+
+CASES = {
+    'negative zero': 'var a = 0.0; var b = -0.0; return [a + "", b + ""];',
+    'error in loadfast_pushc_binop': 'var f = {g: {}};\nvar z = f.g -\n  "x";\nreturn z;',
+    'error in loadfast_loadfast_binop': 'var f = {};\nvar h = 1;\nvar z = f -\n  h;\nreturn z;',
+    'error in pushc_binop': 'var f = {g: {}};\nvar z = f.g.k -\n  1;\nreturn z;',
+}
+
+def run(engine, code):
+    calls = []
+    def rpc(method, params):
+        calls.append(repr((method, params)))
+        return {'count': len(method), 'items': [{'id': len(method), 'method': method}]}
+    try: ans = ('ok', engine(code, {}, rpc, False))
+    except Exception as e: ans = ('error', type(e).__name__, str(e), getattr(e, 'pc', None))
+    return ans, sorted(calls)
+
+def main(files):
+    bad = 0
+    sources = [(i, open(i).read()) for i in files] + sorted(CASES.items())
+    for i, src in sources:
+        for optimize in (False, True):
+            try: code = vkscript.compile(src, optimize)
+            except Exception as e:
+                print('%s: %s'%(i, str(e).split('\n')[0]), file=sys.stderr)
+                break
+            same = repr(list(bytecode.loads(bytecode.dumps(code)))) == repr(list(code))
+            if not same: bad += 1
+            print('%-8s %-9s %s%s'%('ok' if same else 'MISMATCH', 'bytecode', i, ' (optimized)' if optimize else ''))
+            expected = run(runtime.execute, code)
+            for name, engine in sorted(vkscript.engines.items()):
+                if engine is runtime.execute: continue
+                got = run(engine, code)
+                if got != expected: bad += 1
+                print('%-8s %-9s %s%s'%('ok' if got == expected else 'MISMATCH', name, i, ' (optimized)' if optimize else ''))
+                if got != expected: print('  interp: %r\n  %s: %r'%(expected, name, got))
+    return bad
+
+if __name__ == '__main__':
+    sys.exit(1 if main(sys.argv[1:] or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts', '*.js')))) else 0)
@@ -0,0 +1,46 @@
+import glob, os, random, re, signal, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import reflex, vkscript.lexer as lexer
+
+# the reference lexer lets an empty // comment swallow the following line, and
+# loops or crashes when a comment or identifier runs into the end of the source;
+# both lexers get sources with a character after every // and a final newline
+EMPTY_COMMENT = re.compile(r'//(?=[^\S\n]*\n)')
+
+ALPHABET = ['a', 'b1', '_x', '12', ' ', '\n', '\t', '"', "'", '\\', '(', ')', '[', ']', '{', '}', '?', ':', ';', ',', '.', '@', '@.', '+', '-', '*', '/', '//', '/*', '*/', '=', '==', '!', '<', '>>', '&&', '|', '~', '%', '#', '^', 'ы']
+
+def dump(x):
+    if isinstance(x, lexer.Enclosed): return (type(x).__name__, x.line, x.startpos, [dump(i) for i in x.value])
+    return (type(x).__name__, x.line, x.startpos, x.value)
+
+def timeout(*args): raise TimeoutError
+
+def run(lex, src):
+    signal.setitimer(signal.ITIMER_REAL, 0.05)
+    try: return ('ok', dump(lex(src)))
+    except lexer.VKSyntaxError as e: return ('error', e.line, e.startpos, e.value)
+    except (TimeoutError, AttributeError) as e: return None
+    finally: signal.setitimer(signal.ITIMER_REAL, 0)
+
+def main(n=20000, seed=0):
+    signal.signal(signal.SIGALRM, timeout)
+    rnd = random.Random(seed)
+    sources = [open(i).read() for i in glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts', '*.js'))]
+    sources += [''.join(rnd.choice(ALPHABET) for j in range(rnd.randrange(1, 30))) for i in range(n)]
+    bad = skipped = 0
+    for src in sources:
+        src = EMPTY_COMMENT.sub('//.', src if src.endswith('\n') else src+'\n')
+        expected = run(reflex.lex, src)
+        if expected == None:
+            skipped += 1
+            continue
+        got = run(lexer.lex, src)
+        if got != expected:
+            bad += 1
+            if bad <= 10: print('MISMATCH %r\n  reference: %r\n  lex:       %r'%(src, expected, got))
+    print('%d sources, %d mismatches, %d skipped (reference lexer hangs in an unterminated /*)'%(len(sources), bad, skipped))
+    return bad
+
+if __name__ == '__main__':
+    sys.exit(1 if main(*map(int, sys.argv[1:])) else 0)
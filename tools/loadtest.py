@@ -0,0 +1,66 @@
+import collections, glob, http.client, json, os, socket, subprocess, sys, threading, time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SMALL = 'var a = [], i = 0; while (i < Args.n) { a.push({id: i, name: Args.name + i}); i = i + 1; } return a;'
+
+def requests(n):
+    scripts = [open(i).read() for i in sorted(glob.glob(os.path.join(ROOT, 'scripts', '*.js'))) if not i.endswith('measure.js')]
+    for i in range(n):
+        if i % 2: yield json.dumps({'code': scripts[i // 2 % len(scripts)]}).encode('utf-8')
+        else: yield json.dumps({'code': SMALL, 'args': {'n': 10 + i % 20, 'name': 'u%d'%i}}).encode('utf-8')
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start(*args):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, '-m', 'vkscript.server', '--port', str(port), '--synthetic'] + list(args), cwd=ROOT, stderr=subprocess.PIPE)
+    proc.stderr.readline()
+    return proc, port
+
+def client(port, jobs, latencies, statuses):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    for body in jobs:
+        t = time.perf_counter()
+        conn.request('POST', '/', body)
+        resp = conn.getresponse()
+        resp.read()
+        latencies.append(time.perf_counter() - t)
+        statuses[resp.status] += 1
+    conn.close()
+
+def load(port, n, clients):
+    jobs = list(requests(n))
+    # one counter per client, += on a shared Counter is not atomic across threads
+    latencies, statuses = [], [collections.Counter() for i in range(clients)]
+    threads = [threading.Thread(target=client, args=(port, jobs[i::clients], latencies, statuses[i])) for i in range(clients)]
+    t = time.perf_counter()
+    for i in threads: i.start()
+    for i in threads: i.join()
+    t = time.perf_counter() - t
+    latencies.sort()
+    return n / t, latencies[len(latencies) // 2], latencies[len(latencies) * 99 // 100], sum(statuses, collections.Counter())
+
+def cold(n):
+    t = time.perf_counter()
+    for i, body in zip(range(n), requests(n)):
+        subprocess.run([sys.executable, '-m', 'vkscript', '--synthetic'], cwd=ROOT, input=body+b'\n', stdout=subprocess.DEVNULL)
+    return n / (time.perf_counter() - t)
+
+def main(n=2000, clients=8, workers=2):
+    print('%-34s %8s %8s %8s  %s'%('setup', 'req/s', 'p50 ms', 'p99 ms', 'statuses'))
+    print('%-34s %8.1f'%('cold process per request', cold(20)))
+    for name, args in (('server, no compile cache', ('--cache-size', '0')), ('server', ()), ('server, queue 2, 5ms api latency', ('--queue', '2', '--latency', '0.005'))):
+        proc, port = start('--workers', str(workers), *args)
+        try:
+            load(port, 100, clients)
+            rate, p50, p99, statuses = load(port, n, clients)
+        finally: proc.terminate()
+        proc.wait()
+        print('%-34s %8.1f %8.2f %8.2f  %s'%(name, rate, p50 * 1000, p99 * 1000, dict(statuses)))
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -1,11 +1,14 @@
-import vk.api, json, os, sys, time
+import argparse, os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import vkscript, vkscript.cost as cost, vkscript.fakeapi as fakeapi
 
-api = vk.api.API(vk.api.Session(access_token=os.environ['API_TOKEN']), v='5.78')
+ap = argparse.ArgumentParser()
+ap.add_argument('script')
+ap.add_argument('--replay', metavar='FILE', help='answer API calls from a file recorded with tools/run.py --record')
+ap.add_argument('--verify', action='store_true', help='check the prediction with one api.execute call')
+args = ap.parse_args()
 
-code = open(sys.argv[1]).read()
-
-low = -9935
-high = 10001
+code = open(args.script).read()
 
 varname = '__'+os.urandom(64).hex()
 
@@ -19,17 +22,18 @@ def gen_cnt(i):
     else:
         return 'var '+varname+'=0;\nwhile('+varname+'<'+str((i-7)//10)+')'+varname+'='+varname+'+1;\n'+gen_cnt((i-7)%10)
 
-while high - low > 1:
-    mid = (high + low) // 2
-    if mid < 0:
-        low = 1
-        continue
-    print(mid, '?', file=sys.stderr)
-    code2 = gen_cnt(10000-mid)+'1;'+code
-    try: api.execute(code=code2)
-    except vk.exceptions.VkAPIError: low = mid
-    else: high = mid
-    time.sleep(0.4)
+# the padded script measured by the old bisection was gen_cnt(10000-n)+'1;'+code
+est = cost.estimate(vkscript.compile('1;'+code), None, fakeapi.Replay(args.replay) if args.replay else fakeapi.Synthetic())
+print('static bounds: %s..%s'%(est['static_min'], 'inf' if est['static_max'] == None else est['static_max']), file=sys.stderr)
+if est['error'] != None: print('local run failed: '+est['error'], file=sys.stderr)
+high = est['ops'] if est['ops'] != None else est['static_max']
+if high == None: sys.exit(1)
+
+if args.verify:
+    import vk.api, vk.exceptions
+    api = vk.api.API(vk.api.Session(access_token=os.environ['API_TOKEN']), v='5.78')
+    try: api.execute(code=gen_cnt(10000-high)+'1;'+code)
+    except vk.exceptions.VkAPIError as e: print('verification failed: %s'%e, file=sys.stderr)
+    else: print('verified', file=sys.stderr)
 
-print(low, '!', file=sys.stderr)
 print(high)
@@ -0,0 +1,57 @@
+import os, sys, tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import bench, vkscript.compiler as compiler, vkscript.runtime as runtime, vkscript.cost as cost
+
+CLASSES = ('VKNull', 'VKBool', 'VKInt', 'VKFloat', 'VKString', 'VKObject')
+SAMPLES = {'VKNull': (), 'VKBool': (True,), 'VKInt': (12345,), 'VKFloat': (1.5,), 'VKString': ('abc',), 'VKObject': (None,)}
+
+def size(cls, args, n=10000):
+    tracemalloc.start()
+    x = [cls(*args) for i in range(n)]
+    ans = tracemalloc.get_traced_memory()[0] / n
+    tracemalloc.stop()
+    return ans
+
+def count(workloads):
+    # counts cells that are really allocated, not the ones handed out from a cache;
+    # the classes stay patched, so this has to run last
+    keep, seen = [], set()
+    fresh = [0]
+    def wrap(cls):
+        orig = cls.__dict__.get('__new__')
+        def new(cls, *args, **kwargs):
+            x = orig(cls, *args, **kwargs) if orig != None else object.__new__(cls)
+            if id(x) not in seen:
+                seen.add(id(x))
+                keep.append(x)
+                fresh[0] += 1
+            return x
+        cls.__new__ = new
+    for i in CLASSES: wrap(getattr(runtime, i))
+    ans = {}
+    for name, (code, args) in workloads.items():
+        fresh[0] = 0
+        bench.execute(code, args)
+        ans[name] = fresh[0]
+    return ans
+
+def main():
+    print('%-10s %6s'%('cell', 'bytes'))
+    for i in CLASSES: print('%-10s %6.1f'%(i, size(getattr(runtime, i), SAMPLES[i])))
+    print('%-10s %6.1f'%('array item', size(runtime.outer_to_vkcell, ([1, 2.5, 'x', None, True] * 200,), 10) / 1000))
+    print()
+    workloads, rows = {}, []
+    for name, (src, args) in bench.workloads().items():
+        code = workloads[name] = (compiler.compile(src), args)
+        t = bench.measure(lambda: code, lambda code: bench.execute(*code), 3, 0.05)['best']
+        try: ticks = cost.ops(code[0], args, bench.rpc)
+        except runtime.VKRuntimeError: ticks = runtime.LIMIT
+        rows.append((name, ticks, t))
+    cells = count(workloads)
+    print('%-28s %7s %8s %9s %9s'%('workload', 'ops', 'cells', 'cells/op', 'us/op'))
+    for name, ticks, t in rows:
+        print('%-28s %7d %8d %9.2f %9.2f'%(name, ticks, cells[name], cells[name] / max(ticks, 1), t / max(ticks, 1) * 1e6))
+
+if __name__ == '__main__':
+    main()
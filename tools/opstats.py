@@ -0,0 +1,40 @@
+import collections, glob, os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import vkscript, vkscript.runtime as runtime
+
+def stub_rpc(method, params):
+    return None
+
+def trace(code, counts):
+    hist = []
+    def loop(prog, stack, pc, ticks):
+        plain = prog[1]
+        for ticks in range(ticks + 1, runtime.LIMIT + 1):
+            if hist and hist[-1][0] != pc - 1: hist.clear()
+            hist.append((pc, code[pc][0]))
+            del hist[:-3]
+            for n in (1, 2, 3):
+                if len(hist) >= n: counts[n][tuple(i for j, i in hist[-n:])] += 1
+            cmd, arg = plain[pc]
+            pc = cmd(stack, arg, pc)
+            if pc < 0: return pc, ticks
+        raise runtime.VKRuntimeError('Too many operations')
+    stack = []
+    stack.append(runtime.outer_to_value({}, (stack, 0)))
+    runtime.resume(code, runtime.prepared(code), stack, 0, 0, stub_rpc, loop)
+
+def main(files):
+    counts = {1: collections.Counter(), 2: collections.Counter(), 3: collections.Counter()}
+    for i in files:
+        try: trace(vkscript.compile(open(i).read()), counts)
+        except (vkscript.VKSyntaxError, vkscript.VKRuntimeError) as e:
+            print('%s: %s'%(i, str(e).split('\n')[0]), file=sys.stderr)
+    total = sum(counts[1].values())
+    print('%d instructions executed'%total)
+    for n, name in ((1, 'opcodes'), (2, 'pairs'), (3, 'triples')):
+        print('\ntop %s:'%name)
+        for k, v in counts[n].most_common(12):
+            print('%8d %5.1f%%  %s'%(v, 100 * v / total, ' '.join(k)))
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts', '*.js'))))
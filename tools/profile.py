@@ -0,0 +1,22 @@
+import argparse, os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import vkscript, vkscript.profile as profile, vkscript.fakeapi as fakeapi
+
+ap = argparse.ArgumentParser()
+ap.add_argument('scripts', nargs='+')
+ap.add_argument('-n', '--repeat', type=int, default=1, help='run every script N times')
+ap.add_argument('--collapsed', metavar='FILE', help='write flamegraph-compatible collapsed stacks to FILE')
+ap.add_argument('--limit', type=int, default=20, help='rows per report section')
+args = ap.parse_args()
+
+prof = profile.Profile()
+api = fakeapi.Synthetic()
+for i in args.scripts:
+    code = vkscript.compile(open(i).read())
+    prof.register(code, os.path.basename(i))
+    for j in range(args.repeat):
+        try: vkscript.runtime.execute(code, None, api, False, prof)
+        except vkscript.VKRuntimeError as e: print('%s: %s'%(i, e), file=sys.stderr)
+prof.report(limit=args.limit)
+if args.collapsed:
+    with open(args.collapsed, 'w') as file: prof.collapsed(file)
@@ -0,0 +1,129 @@
+import json
+from vkscript.lexer import VKSyntaxError, Identifier, Operator, StringLiteral, Enclosed, Source
+
+# the original character-by-character lexer, kept as a reference for lexcheck.py
+
+class SourceReader:
+    def __init__(self, source):
+        self.line = 1
+        self.pos = 1
+        self.prev = (0, 1, 1)
+        self.source = source
+        self.spos = 0
+    def rawget(self):
+        self.prev = (self.spos, self.line, self.pos)
+        if self.spos == len(self.source):
+            return None
+        ch = self.source[self.spos]
+        self.spos += 1
+        if ch == '\n':
+            self.line += 1
+            self.pos = 1
+        else:
+            self.pos += 1
+        return ch
+    def unget(self):
+        self.spos, self.line, self.pos = self.prev
+    def get(self):
+        ch = self.rawget()
+        if ch == None: return None
+        if ch.isspace():
+            while ch != None and ch.isspace(): ch = self.rawget()
+            self.unget()
+            return ' '
+        return ch
+
+def read_identifier(rd):
+    ans = ''
+    while True:
+        c = rd.get()
+        if not (c.isalnum() or c == '_'): break
+        ans += c
+    rd.unget()
+    return ans
+
+ops_trie = {}
+for i in Operator.OPS:
+    cur = ops_trie
+    for j in i:
+        if j not in cur: cur[j] = {}
+        cur = cur[j]
+del i, j, cur
+
+def read_operator(rd):
+    ans = ''
+    cur = ops_trie
+    while True:
+        c = rd.get()
+        if c not in cur: break
+        ans += c
+        cur = cur[c]
+    rd.unget()
+    if ans not in Operator.OPS:
+        if c.isalnum() or c == '_' or c == ' ': c = ''
+        raise VKSyntaxError(None, -1, -1, 'unknown operator: '+ans+c)
+    return ans
+
+def read_string(rd):
+    ans = ''
+    c = rd.get()
+    prev = None
+    while True:
+        c2 = rd.rawget()
+        if c2 == None or c2 == '\n':
+            rd.unget()
+            raise VKSyntaxError(rd.source, rd.line, rd.pos, 'unexpected EOL while parsing')
+        if c == "'" and c2 == '"' and prev != '\\': ans += '\\'
+        if c2 == c and prev != '\\': break
+        ans += c2
+        prev = c2
+    try: return json.loads('"'+ans+'"')
+    except json.JSONDecodeError: raise VKSyntaxError(None, -1, -1, 'invalid string literal: '+ans)
+
+READERS = {Identifier: read_identifier, Operator: read_operator, StringLiteral: read_string}
+
+def read(cls, rd):
+    code, line, startpos = rd.source, rd.line, rd.pos
+    try: data = READERS[cls](rd) if cls in READERS else []
+    except VKSyntaxError as e:
+        if e.code == None:
+            e.code, e.line, e.startpos = code, line, startpos
+        raise e
+    return cls(code, line, startpos, data)
+
+def lex(src):
+    rd = SourceReader(src)
+    stack = [Source(src, 1, 1, [])]
+    while True:
+        c = rd.get()
+        rd.unget()
+        if c == None: break
+        elif c == ' ': continue
+        elif c.isalnum() or c == '_':
+            stack[-1].value.append(read(Identifier, rd))
+        elif c in '"'"'":
+            stack[-1].value.append(read(StringLiteral, rd))
+        elif c in Enclosed.KINDS:
+            i = read(Enclosed.KINDS[c], rd)
+            stack[-1].value.append(i)
+            stack.append(i)
+            rd.get()
+        elif c == stack[-1].ENDING:
+            stack.pop()
+            rd.get()
+        elif c in (')', ']', '}'):
+            raise VKSyntaxError(rd.source, rd.line, rd.pos, 'non-matching bracket')
+        else:
+            op = read(Operator, rd)
+            if op.value == '//':
+                while rd.rawget() != '\n': pass
+            elif op.value == '/*':
+                while True:
+                    while rd.rawget() != '*': pass
+                    if rd.rawget() == '/': break
+                    rd.unget()
+            else:
+                stack[-1].value.append(op)
+    if len(stack) != 1:
+        raise VKSyntaxError(rd.source, rd.line, rd.pos, 'unexpected EOF while parsing')
+    return stack[0]
@@ -1,7 +1,30 @@
-import vk.api, json, os, sys, time
+import argparse, json, os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-api = vk.api.API(vk.api.Session(access_token=os.environ['API_TOKEN']), v='5.78')
+parser = argparse.ArgumentParser()
+parser.add_argument('script')
+parser.add_argument('--local', action='store_true', help='run the script locally, calling the API method by method')
+parser.add_argument('--record', metavar='FILE', help='run locally and append API responses to FILE')
+parser.add_argument('--replay', metavar='FILE', help='run locally against responses recorded in FILE')
+parser.add_argument('--synthetic', action='store_true', help='run locally against generated responses')
+parser.add_argument('--size', type=int, default=10, help='item count for synthetic responses')
+parser.add_argument('--size-of', metavar='METHOD=N', action='append', default=[], help='item count for synthetic responses of one method')
+parser.add_argument('--latency', type=float, default=0, help='simulated latency in seconds for --replay/--synthetic')
+args = parser.parse_args()
 
-code = open(sys.argv[1]).read()
+code = open(args.script).read()
 
-print(api.execute(code=code))
+if not (args.local or args.record or args.replay or args.synthetic):
+    import vk.api
+    api = vk.api.API(vk.api.Session(access_token=os.environ['API_TOKEN']), v='5.78')
+    print(api.execute(code=code))
+    sys.exit(0)
+
+import vkscript, vkscript.fakeapi as fakeapi
+
+if args.replay: rpc = fakeapi.Replay(args.replay, args.latency)
+elif args.synthetic: rpc = fakeapi.Synthetic({k: int(v) for k, v in (i.split('=', 1) for i in args.size_of)}, args.size, latency=args.latency)
+else: rpc = fakeapi.VKAPI(os.environ['API_TOKEN'])
+if args.record: rpc = fakeapi.Recorder(rpc, args.record)
+
+print(json.dumps(vkscript.execute(code, None, rpc), ensure_ascii=False))
@@ -1,7 +1,23 @@
+import os
 from vkscript.lexer import VKSyntaxError
 from vkscript.compiler import compile
-from vkscript.runtime import exec as _exec, VKRuntimeError
+from vkscript.runtime import execute as _execute, async_execute as _async_execute, VKRuntimeError
+from vkscript.cache import CompileCache, default_cache
+import vkscript.translate as translate, vkscript.speculate as speculate
+
+engines = {'interp': _execute, 'translate': translate.execute, 'speculate': speculate.execute}
+ENGINE = os.environ.get('VKSCRIPT_ENGINE', 'interp')
 
 def exec(*pargs, **args):
-    if isinstance(pargs[0], str): pargs = (compile(pargs[0]),)+pargs[1:]
-    return _exec(*pargs, **args)
+    return execute(pargs[0], args, *pargs[1:])
+
+def execute(code, *pargs, engine=None, **args):
+    if isinstance(code, str): code = default_cache.get(code)
+    return engines[engine or ENGINE](code, *pargs, **args)
+
+def async_exec(*pargs, **args):
+    return async_execute(pargs[0], args, *pargs[1:])
+
+def async_execute(code, *pargs, **args):
+    if isinstance(code, str): code = default_cache.get(code)
+    return _async_execute(code, *pargs, **args)
@@ -1,4 +1,4 @@
-from . import exec as vk_exec
-import sys
+from vkscript.batch import main
 
-print(vk_exec(open(sys.argv[1]).read()))
+if __name__ == '__main__':
+    main()
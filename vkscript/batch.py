@@ -0,0 +1,70 @@
+import argparse, json, multiprocessing, sys
+import vkscript, vkscript.encoder as encoder, vkscript.fakeapi as fakeapi, vkscript.runtime as runtime
+
+# batch mode: every job is (script index, Args line) or (None, request line), and comes
+# back as one line of JSON, {"result": ...} or {"error": ...}. Scripts are compiled once per
+# process through vkscript.default_cache
+
+scripts = []
+rpc = runtime.NoAPI
+engine = None
+
+def setup(texts, options):
+    global scripts, rpc, engine
+    scripts = texts
+    if options.replay: rpc = fakeapi.Replay(options.replay)
+    elif options.synthetic: rpc = fakeapi.Synthetic()
+    engine = options.engine
+
+def error(e):
+    return json.dumps({'error': '%s: %s'%(type(e).__name__, e)}, separators=(',', ':')).encode('ascii')
+
+def run(job):
+    script, line = job
+    try:
+        if script == None:
+            req = json.loads(line)
+            if 'code' in req: code = req['code']
+            else:
+                with open(req['file']) as file: code = file.read()
+            args = req.get('args')
+        else:
+            code = scripts[script]
+            args = json.loads(line) if line != None else None
+        return b'{"result":'+vkscript.execute(code, args, rpc, engine=engine, convert=encoder.dumps)+b'}'
+    except Exception as e: return error(e)
+
+def lines(file):
+    for i in file:
+        if i.strip(): yield i
+
+def main():
+    ap = argparse.ArgumentParser(prog='python -m vkscript')
+    ap.add_argument('scripts', nargs='*', help='script files; without any, stdin has one {"code" or "file", "args"} request per line')
+    ap.add_argument('--args', action='store_true', help='run the script once for every line of Args JSON on stdin')
+    ap.add_argument('--json', action='store_true', help='print a JSON line even for a single script')
+    ap.add_argument('--jobs', '-j', type=int, default=1, help='worker processes')
+    ap.add_argument('--engine', choices=sorted(vkscript.engines))
+    ap.add_argument('--replay', metavar='FILE', help='answer API calls from responses recorded in FILE')
+    ap.add_argument('--synthetic', action='store_true', help='answer API calls with generated responses')
+    options = ap.parse_args()
+    if options.args and len(options.scripts) != 1: ap.error('--args needs exactly one script')
+    texts = []
+    for i in options.scripts:
+        with open(i) as file: texts.append(file.read())
+    setup(texts, options)
+    if len(texts) == 1 and not (options.args or options.json):
+        print(vkscript.execute(texts[0], {}, rpc, engine=engine))
+        return
+    if options.args: jobs = ((0, i) for i in lines(sys.stdin.buffer))
+    elif texts: jobs = ((i, None) for i in range(len(texts)))
+    else: jobs = ((None, i) for i in lines(sys.stdin.buffer))
+    out = sys.stdout.buffer
+    if options.jobs > 1:
+        with multiprocessing.Pool(options.jobs, setup, (texts, options)) as pool:
+            for i in pool.imap(run, jobs, 64):
+                out.write(i+b'\n')
+    else:
+        for i in map(run, jobs):
+            out.write(i+b'\n')
+    out.flush()
@@ -0,0 +1,166 @@
+import mmap, struct, zlib
+import vkscript.compiler as compiler
+
+MAGIC = b'VKSB'
+VERSION = 3
+
+# argument kinds: i - integer, c - constant table index, k - key table index
+OPCODES = [
+    ('return', ''),
+    ('binop', 'c'),
+    ('unaryop', 'c'),
+    ('and', 'i'),
+    ('or', 'i'),
+    ('pop', ''),
+    ('popn', 'i'),
+    ('pushc', 'c'),
+    ('makearr', 'i'),
+    ('makeobj', 'k'),
+    ('apicall', 'c'),
+    ('methodcall', 'ci'),
+    ('arrayget', ''),
+    ('attrget', 'c'),
+    ('attrset', 'c'),
+    ('update', ''),
+    ('attrfilter', 'c'),
+    ('pjif', 'i'),
+    ('goto', 'i'),
+    ('putfast', 'i'),
+    ('clrfast', 'i'),
+    ('loadfast', 'i'),
+    ('delattr', 'c'),
+]
+OPNUMS = {name: (i, kinds) for i, (name, kinds) in enumerate(OPCODES)}
+
+HEADER = struct.Struct('<4sHIIII')
+LINE = struct.Struct('<III')
+INSTR = struct.Struct('<BII')
+U32 = struct.Struct('<I')
+I64 = struct.Struct('<q')
+F64 = struct.Struct('<d')
+
+class BytecodeError(Exception): pass
+
+class _Table:
+    def __init__(self):
+        self.items = []
+        self.index = {}
+    def add(self, key, value):
+        if key not in self.index:
+            self.index[key] = len(self.items)
+            self.items.append(value)
+        return self.index[key]
+
+def _const_key(value):
+    # by bits, so 0.0 and -0.0 (or two NaNs) do not share a slot
+    if isinstance(value, float): return (float, F64.pack(value))
+    return (type(value), value)
+
+def _encode_const(value):
+    if value is None: return b'n'
+    elif isinstance(value, bool): return b't' if value else b'f'
+    elif isinstance(value, int):
+        if -0x8000000000000000 <= value < 0x8000000000000000: return b'i'+I64.pack(value)
+        s = str(value).encode('ascii')
+        return b'I'+U32.pack(len(s))+s
+    elif isinstance(value, float): return b'd'+F64.pack(value)
+    elif isinstance(value, str):
+        s = value.encode('utf-8', 'surrogatepass')
+        return b's'+U32.pack(len(s))+s
+    else: raise BytecodeError("can't serialize constant %r"%(value,))
+
+def _checksum(header, body):
+    # covers the table sizes as well, the crc itself is the last header field
+    return zlib.crc32(body, zlib.crc32(header))
+
+def dumps(code):
+    consts = _Table()
+    keys = _Table()
+    instrs = []
+    for cmd, *args in code:
+        if cmd not in OPNUMS: raise BytecodeError('unknown opcode: %r'%cmd)
+        num, kinds = OPNUMS[cmd]
+        if len(args) != len(kinds): raise BytecodeError('bad operand count for %s'%cmd)
+        operands = [0, 0]
+        for i, (kind, arg) in enumerate(zip(kinds, args)):
+            if kind == 'i': operands[i] = arg
+            elif kind == 'c': operands[i] = consts.add(_const_key(arg), arg)
+            else:
+                if not arg: arg = ()
+                operands[i] = keys.add(tuple(arg), [consts.add(_const_key(k), k) for k in arg])
+        instrs.append(INSTR.pack(num, *operands))
+    ans = list(map(_encode_const, consts.items))
+    for k in keys.items:
+        ans.append(U32.pack(len(k)))
+        ans.append(struct.pack('<%dI'%len(k), *k))
+    ans.extend(instrs)
+    runs = code.lines.runs() if getattr(code, 'lines', None) != None else []
+    ans.append(U32.pack(len(runs)))
+    ans.extend(LINE.pack(*i) for i in runs)
+    body = b''.join(ans)
+    header = HEADER.pack(MAGIC, VERSION, len(consts.items), len(keys.items), len(instrs), 0)[:-4]
+    return header + U32.pack(_checksum(header, body)) + body
+
+def dump(code, file):
+    file.write(dumps(code))
+
+def loads(data):
+    with memoryview(data) as view: return _loads(view)
+
+def _loads(data):
+    try:
+        magic, version, nconsts, nkeys, ncode, crc = HEADER.unpack_from(data, 0)
+    except struct.error: raise BytecodeError('truncated header')
+    if magic != MAGIC: raise BytecodeError('not a VKScript bytecode file')
+    if version != VERSION: raise BytecodeError('unsupported bytecode version: %d'%version)
+    pos = HEADER.size
+    if _checksum(data[:pos-4], data[pos:]) != crc: raise BytecodeError('checksum mismatch')
+    try:
+        consts = []
+        for i in range(nconsts):
+            tag = data[pos:pos+1].tobytes()
+            pos += 1
+            if tag == b'n': consts.append(None)
+            elif tag == b't': consts.append(True)
+            elif tag == b'f': consts.append(False)
+            elif tag == b'i':
+                consts.append(I64.unpack_from(data, pos)[0])
+                pos += 8
+            elif tag == b'd':
+                consts.append(F64.unpack_from(data, pos)[0])
+                pos += 8
+            elif tag in (b'I', b's'):
+                l, = U32.unpack_from(data, pos)
+                s = bytes(data[pos+4:pos+4+l])
+                if len(s) != l: raise BytecodeError('truncated constant table')
+                pos += 4 + l
+                consts.append(int(s) if tag == b'I' else s.decode('utf-8', 'surrogatepass'))
+            else: raise BytecodeError('bad constant tag: %r'%tag)
+        keys = []
+        for i in range(nkeys):
+            l, = U32.unpack_from(data, pos)
+            keys.append([consts[j] for j in struct.unpack_from('<%dI'%l, data, pos + 4)])
+            pos += 4 + 4 * l
+        end = pos + INSTR.size * ncode
+        nlines, = U32.unpack_from(data, end)
+        if end + 4 + LINE.size * nlines != len(data): raise BytecodeError('bad code size')
+        ans = compiler.Code()
+        if nlines: ans.lines = compiler.LineTable(LINE.iter_unpack(bytes(data[end+4:])))
+        for num, a, b in INSTR.iter_unpack(bytes(data[pos:end])):
+            cmd, kinds = OPCODES[num]
+            instr = [cmd]
+            for kind, arg in zip(kinds, (a, b)):
+                if kind == 'i': instr.append(arg)
+                elif kind == 'c': instr.append(consts[arg])
+                else: instr.append(keys[arg])
+            ans.append(tuple(instr))
+    except (struct.error, IndexError, ValueError): raise BytecodeError('truncated or corrupted bytecode')
+    return ans
+
+def load(file):
+    if isinstance(file, str):
+        with open(file, 'rb') as file:
+            try: data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError: raise BytecodeError('truncated header')
+            with data: return loads(data)
+    return loads(file.read())
@@ -0,0 +1,57 @@
+import collections, hashlib, os
+import vkscript.compiler as compiler, vkscript.bytecode as bytecode
+
+VERSION = 4
+
+class CompileCache:
+    def __init__(self, maxsize=256, path=None, optimize=False):
+        self.maxsize = maxsize
+        self.path = path
+        self.optimize = optimize
+        self.data = collections.OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path != None: os.makedirs(path, exist_ok=True)
+    def key(self, code):
+        return hashlib.sha256(('%d:%r:'%(VERSION, self.optimize)+code).encode('utf-8')).hexdigest()
+    def get(self, code):
+        key = self.key(code)
+        ans = self.data.get(key)
+        if ans != None:
+            self.hits += 1
+            self.data.move_to_end(key)
+            return ans
+        ans = self._load(key)
+        if ans != None: self.disk_hits += 1
+        else:
+            self.misses += 1
+            ans = compiler.compile(code, self.optimize)
+            self._store(key, ans)
+        self.data[key] = ans
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+        return ans
+    def _file(self, key):
+        return os.path.join(self.path, key+'.vkc')
+    def _load(self, key):
+        if self.path == None: return None
+        try: return bytecode.load(self._file(key))
+        except (OSError, bytecode.BytecodeError): return None
+    def _store(self, key, code):
+        if self.path == None: return
+        tmp = self._file(key)+'.%d.tmp'%os.getpid()
+        try:
+            with open(tmp, 'wb') as file: bytecode.dump(code, file)
+            os.replace(tmp, self._file(key))
+        except OSError: pass
+    def clear(self):
+        self.data.clear()
+    def stats(self):
+        return {'size': len(self.data), 'maxsize': self.maxsize, 'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'evictions': self.evictions}
+    def __len__(self): return len(self.data)
+    def __contains__(self, code): return self.key(code) in self.data
+
+default_cache = CompileCache(int(os.environ.get('VKSCRIPT_CACHE_SIZE', 256)), os.environ.get('VKSCRIPT_CACHE_DIR'))
@@ -1,33 +1,75 @@
+import bisect
 import vkscript.parser as parser, vkscript.lexer as lexer
 
+class Code(list):
+    prepared = None
+    stats = None
+    translated = None
+    speculation = None
+    lines = None
+
+class LineTable:
+    def __init__(self, runs=()):
+        self.starts = []
+        self.positions = []
+        for pc, line, col in runs:
+            self.starts.append(pc)
+            self.positions.append((line, col))
+    @classmethod
+    def build(self, positions):
+        ans = self()
+        for pc, pos in enumerate(positions):
+            if not ans.positions or ans.positions[-1] != pos:
+                ans.starts.append(pc)
+                ans.positions.append(pos)
+        return ans
+    def runs(self):
+        return [(pc, line, col) for pc, (line, col) in zip(self.starts, self.positions)]
+    def select(self, keep):
+        return self.build(self[i] for i, k in enumerate(keep) if k)
+    def __getitem__(self, pc):
+        return self.positions[max(bisect.bisect_right(self.starts, pc) - 1, 0)]
+    def __len__(self):
+        return len(self.starts)
+
 def precompile(code):
     if not isinstance(code, parser.CodeBlock):
         code = parser.parse(code)
+    elif parser.stale(code): code = parser.parse(code.pos.code)
     ans = []
+    positions = []
     stack = [code.compile(False)]
     stack[0].reverse()
+    pos = [code.pos]
     while True:
         while stack and not stack[-1]:
             stack.pop()
+            pos.pop()
         if not stack: break
         instr = stack[-1].pop()
         if instr[0] == '.recur':
 #           print(instr[1])
             stack.append(instr[1].compile())
             stack[-1].reverse()
+            pos.append(instr[1].pos)
         else:
             if isinstance(instr, str): instr = (instr,)
             ans.append(instr)
-    return ans
+            positions.append((pos[-1].line, pos[-1].startpos))
+    return ans, positions
 
-def compile(code):
-    code = precompile(code)
+def compile(code, optimize=False):
+    code, positions = precompile(code)
+    lines = []
     ans = []
     comefrom_stack = []
     goto_stack = []
     cgoto_stack = []
-    varnames_stack = [({'Args': 0, 0: 1}, set('Args'))]
-    for cmd, *args in code:
+    varnames_stack = [({'Args': 0, 0: 1}, {'Args'})]
+    pos = (1, 1)
+    for (cmd, *args), cur in zip(code, positions):
+        lines.extend(pos for i in range(len(ans) - len(lines)))
+        pos = cur
         if cmd == '.comefrom':
             comefrom_stack.append(len(ans))
         elif cmd == '.goto':
@@ -62,15 +104,15 @@ def compile(code):
                 ans.extend((('putfast', varnames_stack[-1][0][args[0]]), ('pop',)))
         elif cmd == '.delvar':
             if args[0].name not in varnames_stack[-1][0]:
-                raise lexer.VKSyntaxError.fromLexem(args[0], 'undefined variable `%s\''%args[0].name)
+                raise lexer.VKSyntaxError.fromLexem(args[0].pos, 'undefined variable `%s\''%args[0].name)
             ans.append(('clrfast', varnames_stack[-1][0][args[0].name]))
         elif cmd == '.setvar':
             if args[0].name not in varnames_stack[-1][0]:
-                raise lexer.VKSyntaxError.fromLexem(args[0], 'undefined variable `%s\''%args[0].name)
+                raise lexer.VKSyntaxError.fromLexem(args[0].pos, 'undefined variable `%s\''%args[0].name)
             ans.append(('putfast', varnames_stack[-1][0][args[0].name]))
         elif cmd == '.getvar':
             if args[0].name not in varnames_stack[-1][0]:
-                raise lexer.VKSyntaxError.fromLexem(args[0], 'undefined variable `%s\''%args[0].name)
+                raise lexer.VKSyntaxError.fromLexem(args[0].pos, 'undefined variable `%s\''%args[0].name)
             ans.append(('loadfast', varnames_stack[-1][0][args[0].name]))
         elif cmd == '.leave':
             if varnames_stack[-1][1]:
@@ -78,5 +120,12 @@ def compile(code):
             varnames_stack.pop()
         else:
             ans.append((cmd,)+tuple(args))
+    lines.extend(pos for i in range(len(ans) - len(lines)))
     ans.extend((('pushc', None), ('return',)))
+    lines.extend((pos, pos))
+    ans = Code(ans)
+    ans.lines = LineTable.build(lines)
+    if optimize:
+        import vkscript.optimizer as optimizer
+        ans = optimizer.optimize(ans, *(() if optimize == True else (optimize,)))
     return ans
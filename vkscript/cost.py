@@ -0,0 +1,46 @@
+import collections
+import vkscript.runtime as runtime, vkscript.optimizer as optimizer
+
+def successors(code, pc):
+    cmd = code[pc][0]
+    if cmd == 'return': return ()
+    elif cmd == 'goto': return (code[pc][1],)
+    elif cmd in optimizer.JUMPS: return (pc + 1, code[pc][1])
+    return (pc + 1,)
+
+def bounds(code):
+    dist = {0: 1}
+    queue = collections.deque([0])
+    lo = None
+    while queue:
+        pc = queue.popleft()
+        if code[pc][0] == 'return' and lo == None: lo = dist[pc]
+        for i in successors(code, pc):
+            if i not in dist and i < len(code):
+                dist[i] = dist[pc] + 1
+                queue.append(i)
+    if any(code[pc][1] <= pc for pc in dist if code[pc][0] in optimizer.JUMPS): return lo, None
+    longest = {}
+    for pc in sorted(dist, reverse=True):
+        nxt = [longest[i] for i in successors(code, pc) if i in longest]
+        longest[pc] = 1 + max(nxt, default=0)
+    return lo, longest[0]
+
+def ops(code, args=None, rpc=runtime.NoAPI):
+    if args == None: args = {}
+    last = [0]
+    def loop(prog, stack, pc, ticks):
+        pc, last[0] = runtime.run(prog, stack, pc, ticks)
+        return pc, last[0]
+    stack = []
+    stack.append(runtime.outer_to_value(args, (stack, 0)))
+    try: runtime.resume(code, runtime.prepared(code), stack, 0, 0, rpc, loop)
+    except runtime.VKRuntimeError as e: raise runtime.locate(e, code)
+    return last[0]
+
+def estimate(code, args=None, rpc=runtime.NoAPI):
+    lo, hi = bounds(code)
+    ans = {'static_min': lo, 'static_max': hi, 'ops': None, 'error': None}
+    try: ans['ops'] = ops(code, args, rpc)
+    except runtime.VKRuntimeError as e: ans['error'] = e.args[0]
+    return ans
@@ -0,0 +1,70 @@
+import json
+import vkscript.runtime as runtime
+
+# writes results as compact JSON straight from cells, the text is the same as
+# json.dumps(vkcell_to_outer(value), separators=(',', ':'))
+
+CHUNK = 4096 # pieces of text per write
+
+encode_string = json.encoder.encode_basestring_ascii
+
+def encode_float(d):
+    if d != d: return 'NaN'
+    elif d == float('inf'): return 'Infinity'
+    elif d == -float('inf'): return '-Infinity'
+    return float.__repr__(d)
+
+SCALARS = {
+    type(None): lambda x: 'null',
+    bool: lambda x: 'true' if x else 'false',
+    int: int.__repr__,
+    float: encode_float,
+    str: encode_string,
+    runtime.VKNull: lambda x: 'null',
+    runtime.VKBool: lambda x: 'true' if x.b else 'false',
+    runtime.VKInt: lambda x: repr(runtime.to_signed(x.n)),
+    runtime.VKFloat: lambda x: encode_float(x.d),
+    runtime.VKString: lambda x: encode_string(x.s),
+}
+
+def members(obj):
+    if runtime.is_array(obj): return False, obj.values()
+    return True, obj.items()
+
+def encode(value):
+    if not isinstance(value, runtime.VKObject):
+        yield SCALARS[type(value)](value)
+        return
+    keyed, items = members(value)
+    stack = [(keyed, items)]
+    head = '{' if keyed else '['
+    while stack:
+        keyed, items = stack[-1]
+        for x in items:
+            if keyed:
+                head += encode_string(x[0])+':'
+                x = x[1]
+            f = SCALARS.get(type(x))
+            if f == None:
+                keyed, items = members(x)
+                stack.append((keyed, items))
+                head += '{' if keyed else '['
+                break
+            yield head+f(x)
+            head = ','
+        else:
+            stack.pop()
+            yield (head if head != ',' else '')+('}' if keyed else ']')
+            head = ','
+
+def dump(value, file):
+    buf = []
+    for i in encode(value):
+        buf.append(i)
+        if len(buf) >= CHUNK:
+            file.write(''.join(buf).encode('ascii'))
+            buf.clear()
+    if buf: file.write(''.join(buf).encode('ascii'))
+
+def dumps(value):
+    return ''.join(encode(value)).encode('ascii')
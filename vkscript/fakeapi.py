@@ -0,0 +1,101 @@
+import asyncio, collections, json, random, time
+from vkscript.runtime import VKRuntimeError
+
+def strip(method):
+    return method[4:] if method.startswith('API.') else method
+
+def canonical(method, params):
+    return json.dumps([strip(method), params], sort_keys=True, ensure_ascii=False)
+
+class FakeAPI:
+    def __init__(self, handlers=None, latency=0, default=None):
+        self.handlers = dict(handlers or {})
+        self.latency = latency
+        self.default = default
+        self.calls = 0
+    def response(self, method, params):
+        self.calls += 1
+        return self.handle(strip(method), params)
+    def handle(self, method, params):
+        handler = self.handlers.get(method, self.default)
+        if handler == None: raise VKRuntimeError('Unknown method: '+method)
+        return handler(method, params) if callable(handler) else handler
+    def __call__(self, method, params):
+        if self.latency: time.sleep(self.latency)
+        return self.response(method, params)
+
+class AsyncFakeAPI(FakeAPI):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.inflight = 0
+        self.max_inflight = 0
+    async def __call__(self, method, params):
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try: await asyncio.sleep(self.latency)
+        finally: self.inflight -= 1
+        return self.response(method, params)
+
+class Recorder:
+    def __init__(self, rpc, path):
+        self.rpc = rpc
+        self.path = path
+    def write(self, entry):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry, ensure_ascii=False)+'\n')
+    def __call__(self, method, params):
+        entry = {'method': strip(method), 'params': params}
+        try: entry['response'] = self.rpc(method, params)
+        except VKRuntimeError as e:
+            entry['error'] = str(e)
+            self.write(entry)
+            raise
+        self.write(entry)
+        return entry['response']
+
+class Replay(FakeAPI):
+    def __init__(self, path, latency=0):
+        super().__init__(latency=latency)
+        self.responses = collections.defaultdict(collections.deque)
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if not line.strip(): continue
+                entry = json.loads(line)
+                self.responses[canonical(entry['method'], entry['params'])].append(entry)
+    def handle(self, method, params):
+        queue = self.responses.get(canonical(method, params))
+        if not queue: raise VKRuntimeError('No recorded response for '+method)
+        entry = queue.popleft() if len(queue) > 1 else queue[0]
+        if 'error' in entry: raise VKRuntimeError(entry['error'])
+        return entry['response']
+
+class Synthetic(FakeAPI):
+    def __init__(self, sizes=None, size=10, text=32, latency=0, seed=0):
+        super().__init__(latency=latency)
+        self.sizes = dict(sizes or {})
+        self.size = size
+        self.text = text
+        self.seed = seed
+    def item(self, rnd, id):
+        return {'id': id, 'owner_id': rnd.randrange(1, 10**9), 'date': rnd.randrange(10**9, 2 * 10**9), 'first_name': 'Name%d'%id, 'last_name': 'Surname%d'%id, 'text': ''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz ') for i in range(self.text))}
+    def handle(self, method, params):
+        rnd = random.Random('%d:%s'%(self.seed, canonical(method, params)))
+        ids = [v for k, v in sorted(params.items()) if k.endswith('_ids')] if isinstance(params, dict) else []
+        if ids:
+            ids = ids[0] if isinstance(ids[0], list) else str(ids[0]).split(',')
+            return [self.item(rnd, int(i) if str(i).lstrip('-').isdigit() else n) for n, i in enumerate(ids)]
+        n = self.sizes.get(method, self.size)
+        if isinstance(params, dict) and isinstance(params.get('count'), int): n = min(n, params['count'])
+        return {'count': self.sizes.get(method, self.size), 'items': [self.item(rnd, i + 1) for i in range(n)]}
+
+class AsyncReplay(AsyncFakeAPI, Replay): pass
+class AsyncSynthetic(AsyncFakeAPI, Synthetic): pass
+
+class VKAPI:
+    def __init__(self, token, version='5.78'):
+        import vk.api
+        self.api = vk.api.API(vk.api.Session(access_token=token), v=version)
+    def __call__(self, method, params):
+        import vk.exceptions
+        try: return self.api(strip(method), **params)
+        except vk.exceptions.VkAPIError as e: raise VKRuntimeError(str(e))
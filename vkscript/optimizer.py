@@ -0,0 +1,114 @@
+import vkscript.runtime as runtime, vkscript.compiler as compiler
+
+JUMPS = ('and', 'or', 'pjif', 'goto')
+PASSES = ('fold', 'jumps', 'deadcode', 'pushpop')
+
+def targets(code):
+    return {instr[1] for instr in code if instr[0] in JUMPS}
+
+def compact(code, keep, lines=None):
+    newidx = []
+    n = 0
+    for i in keep:
+        newidx.append(n)
+        n += i
+    newidx.append(n)
+    ans = compiler.Code()
+    for i, instr in enumerate(code):
+        if keep[i]:
+            if instr[0] in JUMPS: instr = (instr[0], newidx[instr[1]])+instr[2:]
+            ans.append(instr)
+    if lines != None: ans.lines = lines.select(keep)
+    return ans
+
+def _const(instr):
+    if instr[0] != 'pushc': return None
+    return runtime.outer_to_value(instr[1])
+
+def _fold_value(op, *args):
+    try: ans = op(*args)
+    except (runtime.VKRuntimeError, ArithmeticError, ValueError): return None
+    if isinstance(ans, runtime.VKObject): return None
+    return ('pushc', runtime.vkcell_to_outer(ans))
+
+def fold(code):
+    lines = code.lines
+    code = list(code)
+    keep = [True] * len(code)
+    tgt = targets(code)
+    prev = []
+    for i, instr in enumerate(code):
+        cmd = instr[0]
+        if i in tgt: prev.clear()
+        if cmd == 'binop' and len(prev) >= 2 and code[prev[-1]][0] == code[prev[-2]][0] == 'pushc':
+            new = _fold_value(runtime.binops[instr[1]], _const(code[prev[-2]]), _const(code[prev[-1]]))
+            if new != None:
+                code[prev[-2]] = new
+                keep[prev.pop()] = keep[i] = False
+                continue
+        elif cmd == 'unaryop' and prev and code[prev[-1]][0] == 'pushc':
+            new = _fold_value(runtime.unaryops[instr[1]], _const(code[prev[-1]]))
+            if new != None:
+                code[prev[-1]] = new
+                keep[i] = False
+                continue
+        elif cmd == 'pjif' and prev and code[prev[-1]][0] == 'pushc':
+            if runtime.truth(_const(code[prev[-1]])): keep[prev.pop()] = False
+            else: code[prev.pop()] = ('goto', instr[1])
+            keep[i] = False
+            continue
+        prev.append(i)
+    return compact(code, keep, lines)
+
+def jumps(code):
+    lines = code.lines
+    code = list(code)
+    keep = [True] * len(code)
+    for i, instr in enumerate(code):
+        if instr[0] not in JUMPS: continue
+        t = instr[1]
+        seen = set()
+        while t < len(code) and code[t][0] == 'goto' and t not in seen:
+            seen.add(t)
+            t = code[t][1]
+        code[i] = (instr[0], t)+instr[2:]
+    for i, instr in enumerate(code):
+        if instr[0] == 'goto' and instr[1] == i + 1: keep[i] = False
+    return compact(code, keep, lines)
+
+def deadcode(code):
+    keep = [False] * len(code)
+    stack = [0]
+    while stack:
+        i = stack.pop()
+        if i >= len(code) or keep[i]: continue
+        keep[i] = True
+        cmd = code[i][0]
+        if cmd in JUMPS: stack.append(code[i][1])
+        if cmd not in ('goto', 'return'): stack.append(i + 1)
+    return compact(code, keep, code.lines)
+
+def pushpop(code):
+    keep = [True] * len(code)
+    tgt = targets(code)
+    prev = []
+    for i, instr in enumerate(code):
+        if i in tgt: prev.clear()
+        if instr[0] == 'pop' and prev and code[prev[-1]][0] in ('pushc', 'loadfast'):
+            keep[prev.pop()] = keep[i] = False
+            continue
+        prev.append(i)
+    return compact(code, keep, code.lines)
+
+def optimize(code, passes=PASSES):
+    stats = {i: 0 for i in passes}
+    while True:
+        changed = False
+        for i in passes:
+            new = globals()[i](code)
+            if len(new) != len(code) or new != code: changed = True
+            stats[i] += len(code) - len(new)
+            code = new
+        if not changed: break
+    code.stats = stats
+    return code
@@ -9,10 +9,12 @@ class Node:
 class CodeBlock(Node):
     def __init__(self, code):
         self.children = []
+        self.starts = []
         cur = self.children
         prev_if = []
         idx = 0
         while idx < len(code.value):
+            start, n = idx, len(self.children)
             if isinstance(code.value[idx], lexer.Identifier):
                 x = code.value[idx].value
             else:
@@ -21,7 +23,7 @@ class CodeBlock(Node):
             if x != 'else' and cur is self.children: prev_if.clear()
             if x in ('if', 'while'):
                 if len(code.value) <= idx + 1 or not isinstance(code.value[idx + 1], lexer.EnclosedParens):
-                    raise lexer.VKSyntaxError.fromLexem(code.value[min(len(code.value)-1, idx+1)], i+': expected parenthesis')
+                    raise lexer.VKSyntaxError.fromLexem(code.value[min(len(code.value)-1, idx+1)], x+': expected parenthesis')
                 inner = [(AssignExpr, [code.value[idx+1]])]
                 if x == 'if': prev_if.append(inner)
                 cur.append((If if x == 'if' else While, inner))
@@ -55,6 +57,8 @@ class CodeBlock(Node):
                     cur.append((DropExpr, code.value[idx:i]))
                 idx = i + 1
                 cur = self.children
+            if len(self.children) > n: self.starts.append(start)
+        self.complete = cur is self.children
     def compile(self, popvars=True):
         ans = []
         if popvars: ans.append(('.enter'))
@@ -71,9 +75,11 @@ class If(IfElseWhile):
     def compile(self):
         ans = [('.recur', self.children[0]), '.cgoto', '.enter']
         else_blk = None
-        if isinstance(self.children[-1], Else):
-            else_blk = self.children.pop()
-        for i in self.children[1:]:
+        children = self.children
+        if isinstance(children[-1], Else):
+            else_blk = children[-1]
+            children = children[:-1]
+        for i in children[1:]:
             ans.append(('.recur', i))
         ans.append('.leave')
         if else_blk != None:
@@ -104,7 +110,7 @@ class VarDecl(Node):
         idx = 0
         while True:
             if idx >= len(data) or not isinstance(data[idx], lexer.Identifier):
-                raise lexer.VKSyntaxError.fromLexem(data[min(data.length-1, idx)], 'expected identifier')
+                raise lexer.VKSyntaxError.fromLexem(data[min(len(data)-1, idx)], 'expected identifier')
             name = data[idx].value
             if name in ('if', 'while', 'var', 'delete', 'return', 'API'):
                 raise lexer.VKSyntaxError.fromLexem(data[idx], '`'+name+'\' unexpected')
@@ -122,6 +128,7 @@ class VarDecl(Node):
                     idx += 1
                 self.varnames.append(name)
                 self.children.append((AssignExpr, data[idx0:idx]))
+                idx += 1
             if idx >= len(data): break
     def compile(self):
         ans = []
@@ -139,12 +146,12 @@ class DelRet(Node):
 
 class Delete(DelRet):
     def compile(self):
-        if isinstance(self.children[0], AttrGet):
+        if isinstance(self.children[0], AttrGetExpr):
             return [('.recur', self.children[0].children[0]), ('delattr', self.children[0].attr), 'update']
         elif isinstance(self.children[0], Variable):
             return [('.delvar', self.children[0])]
         else:
-            raise lexer.VKSyntaxError.fromLexem(self.children[0], 'expected identifier')
+            raise lexer.VKSyntaxError.fromLexem(self.children[0].pos, 'expected identifier')
         
 class Return(DelRet):
     def compile(self):
@@ -156,31 +163,8 @@ class BinaryOpExpr(Expression):
     def compile(self):
         return [('.recur', self.children[0]), ('.recur', self.children[1]), ('binop', self.op)]
 
-class LeftAssocExpr(BinaryOpExpr):
-    def __init__(self, data):
-        i = len(data) - 1
-        while i > 0:
-            if isinstance(data[i], lexer.Operator) and data[i].value in self.OPS and not isinstance(data[i - 1], lexer.Operator):
-                self.op = data[i].value
-                self.children = [(self, data[:i]), (self.NEXT, data[i+1:])]
-                break
-            i -= 1
-        else:
-            self.op = None
-            self.replace = (self.NEXT, data)
-
-class RightAssocExpr(BinaryOpExpr):
-    def __init__(self, data):
-        i = 1
-        while i < len(data):
-            if isinstance(data[i], lexer.Operator) and data[i].value in self.OPS and not isinstance(data[i - 1], lexer.Operator):
-                self.op = data[i].value
-                self.children = [(self.NEXT, data[:i]), (self, data[i+1:])]
-                break
-            i += 1
-        else:
-            self.op = None
-            self.replace = (self.NEXT, data)
+class LeftAssocExpr(BinaryOpExpr): pass
+class RightAssocExpr(BinaryOpExpr): pass
 
 class LeafExpr(Expression):
     def __init__(self, data):
@@ -319,14 +303,7 @@ class OrExpr(LogicalExpr):
     NEXT = AndExpr
 
 class TernaryOpExpr(Expression):
-    def __init__(self, data):
-        i = 0
-        while i < len(data):
-            if isinstance(data[i], lexer.EnclosedTernary):
-                self.children = [(OrExpr, data[:i]), (AssignExpr, data[i].value), (TernaryOpExpr, data[i+1:])]
-                break
-            i += 1
-        else: self.replace = (OrExpr, data)
+    NEXT = OrExpr
     def compile(self):
         return [('.recur', self.children[0]), '.cgoto', ('.recur', self.children[1]), '.goto', '.clabel', ('.recur', self.children[2]), '.label']
 
@@ -334,15 +311,49 @@ class AssignExpr(RightAssocExpr):
     OPS = ['=']
     NEXT = TernaryOpExpr
     def __init__(self, data):
-        super().__init__(data)
-        if self.op == '=' and AtomicExpr._get_dotted(self.children[0][1]) == None:
-            raise lexer.VKSyntaxError.fromLexem(self.children[0][1][0], 'non-variable in assignment')
+        operands = []
+        ops = []
+        def reduce():
+            prec, cls, k = ops.pop()
+            right, rs, re = operands.pop()
+            left, ls, le = operands.pop()
+            node = self if cls is AssignExpr and not ops else cls.__new__(cls)
+            if cls is TernaryOpExpr: node.children = [left, (AssignExpr, data[k].value), right]
+            else:
+                node.op = data[k].value
+                node.children = [left, right]
+            node.pos = data[ls] if ls < re else data[k]
+            operands.append((node, ls, re))
+        start = 0
+        for k, tok in enumerate(data):
+            if isinstance(tok, lexer.EnclosedTernary): prec, cls, right = PRECEDENCE['?']
+            elif k and isinstance(tok, lexer.Operator) and tok.value in PRECEDENCE and not isinstance(data[k - 1], lexer.Operator):
+                prec, cls, right = PRECEDENCE[tok.value]
+                # only `=' may directly follow `? :', other operators are unary there
+                if cls is not AssignExpr and isinstance(data[k - 1], lexer.EnclosedTernary): continue
+            else: continue
+            operands.append(((UnaryOpExpr, data[start:k]), start, k))
+            while ops and (ops[-1][0] > prec or ops[-1][0] == prec and not right): reduce()
+            if cls is AssignExpr and AtomicExpr._get_dotted(data[operands[-1][1]:k]) == None:
+                raise lexer.VKSyntaxError.fromLexem(data[operands[-1][1]] if operands[-1][1] < k else tok, 'non-variable in assignment')
+            ops.append((prec, cls, k))
+            start = k + 1
+        operands.append(((UnaryOpExpr, data[start:]), start, len(data)))
+        while ops: reduce()
+        if operands[0][0] is not self:
+            self.op = None
+            self.replace = operands[0][0]
     def compile(self):
         if isinstance(self.children[0], AttrGetExpr):
             return [('.recur', self.children[0].children[0]), ('.recur', self.children[1]), ('attrset', self.children[0].attr), 'update']
         elif isinstance(self.children[0], Variable):
             return [('.recur', self.children[1]), ('.setvar', self.children[0])]
 
+PRECEDENCE = {'?': (1, TernaryOpExpr, True), '=': (0, AssignExpr, True)}
+for prec, cls in enumerate((OrExpr, AndExpr, BitOrExpr, BitAndExpr, EqOpExpr, CompareExpr, ShiftExpr, AddSubExpr, MulOpExpr)):
+    PRECEDENCE.update((op, (prec + 2, cls, False)) for op in cls.OPS)
+del prec, cls
+
 class DropExpr(Node):
     def __init__(self, data):
         self.children = [(AssignExpr, data)]
@@ -420,7 +431,7 @@ class CallExpr(CommaExpr):
 class SingleArgCallExpr(CallExpr):
     def __init__(self, name, args):
         self.cntr = 0
-        super().__init__(self, name, args)
+        super().__init__(name, args)
     def handle(self, chk):
         self.cntr += 1
         if self.cntr == 2 and chk:
@@ -434,7 +445,7 @@ class SingleArgCallExpr(CallExpr):
         return ans
 
 class APICallExpr(SingleArgCallExpr):
-    def default(self): return ('makeobj', 0)
+    def default(self): return ('makeobj', [])
     def emit_call(self): return ('apicall', self.name)
 
 class BuiltinCallExpr(SingleArgCallExpr):
@@ -472,29 +483,116 @@ class FilterExpr(Expression):
     def compile(self):
         return [('.recur', self.children[0]), ('attrfilter', self.attr)]
 
+def first_lexem(args):
+    for i in args:
+        if isinstance(i, list) and i: i = i[0]
+        if isinstance(i, tuple): i = first_lexem(i[1:])
+        if isinstance(i, lexer.Lexem): return i
+    return None
+
 def parse(code):
     if isinstance(code, str):
         code = lexer.lex(code)
     root = CodeBlock(code)
     assert not hasattr(root, 'replace')
-    stack = [[root.children, 0]]
+    return build(root, code)
+
+def build(root, code):
+    root.pos = code
+    stack = [[root.children, 0, code]]
     while stack:
         x = stack[-1]
-        l, i = x
+        l, i, pos = x
         if i == len(l):
             stack.pop()
             continue
         x[1] += 1
+        if isinstance(l[i], tuple): pos = first_lexem(l[i][1:]) or pos
         while True:
             if isinstance(l[i], tuple):
                 cls = l[i][0]
                 if not isinstance(cls, type): cls = type(cls)
 #               print(l[i-1:i+1], cls, l[i][1:])
                 l[i] = cls(*l[i][1:])
+                l[i].pos = pos
             elif hasattr(l[i], 'replace'):
                 l[i] = l[i].replace
+                if not isinstance(l[i], tuple): l[i].pos = pos
             elif hasattr(l[i], 'children'):
-                stack.append([l[i].children, 0])
+                stack.append([l[i].children, 0, pos])
                 break
             else: break
     return root
+
+def _first_entry(tree, line):
+    lo, hi = 0, len(tree.starts)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if tree.pos.value[tree.starts[mid]].line < line: lo = mid + 1
+        else: hi = mid
+    return lo
+
+# trees made by reparse share the lexems after the edit, and an edit that adds or removes
+# lines moves them in place; that makes every other tree sharing them stale, those are
+# counted by a version per lineage and get parsed again from their own source when used
+
+def stale(tree):
+    code = tree.pos
+    return getattr(code, 'lineage', None) != None and code.version != code.lineage[0]
+
+def reparse(tree, start, end, text):
+    code = tree.pos
+    old, tokens, starts = code.code, code.value, tree.starts
+    src = old[:start]+text+old[end:]
+    if stale(tree): return parse(src)
+    line = old.count('\n', 0, start) + 1
+    endline = line + old.count('\n', start, end)
+    delta = text.count('\n') - (endline - line)
+    # statements starting on the edited lines may change, so does the one before them
+    # (an inserted `else' or a deleted `;' can glue it to the edit)
+    i = _first_entry(tree, line) - 1
+    if i < 0: p = a = 0
+    else:
+        p = starts[i]
+        a, l = start, line
+        while l >= tokens[p].line:
+            a = old.rfind('\n', 0, a)
+            l -= 1
+        a += tokens[p].startpos
+    j = k = _first_entry(tree, endline + 1)
+    b, l, step = start + len(text), endline + delta, 1
+    while True:
+        # resynchronize at the first untouched statement that the new text does not run into
+        if k < len(starts):
+            while l < tokens[starts[k]].line + delta:
+                b = src.find('\n', b) + 1
+                l += 1
+            b2 = b + tokens[starts[k]].startpos - 1
+        else: b2 = len(src)
+        try:
+            region = lexer.lex(src, a, b2)
+            root = CodeBlock(region)
+            if root.complete or k == len(starts): break
+        except lexer.VKSyntaxError as e:
+            if k == len(starts) or not e.value.startswith(('unexpected EO', 'expected `;\'', 'if:', 'while:')) or e.value == 'unexpected EOL while parsing' and e.line < l: raise
+        k = min(k + step, len(starts))
+        step *= 2
+    build(root, region)
+    q = starts[k] if k < len(starts) else len(tokens)
+    if getattr(code, 'lineage', None) == None: code.lineage, code.version = [0], 0
+    if delta:
+        code.lineage[0] += 1
+        stack = [tokens[q:]]
+        while stack:
+            for x in stack.pop():
+                x.code = src
+                x.line += delta
+                if isinstance(x, lexer.Enclosed): stack.append(x.value)
+    ans = CodeBlock.__new__(CodeBlock)
+    ans.children = tree.children[:max(i, 0)]+root.children+tree.children[k:]
+    n = p + len(region.value) - q
+    ans.starts = starts[:max(i, 0)]+[p + s for s in root.starts]+[s + n for s in starts[k:]]
+    ans.complete = root.complete if k == len(starts) else tree.complete
+    ans.pos = lexer.Source(src, 1, 1, tokens[:p]+region.value+tokens[q:])
+    ans.pos.lineage, ans.pos.version = code.lineage, code.lineage[0]
+    return ans
@@ -0,0 +1,76 @@
+import collections, sys, time
+import vkscript.runtime as runtime
+
+class Profile:
+    def __init__(self):
+        self.codes = {}
+        self.stats = collections.defaultdict(lambda: [0, 0])
+        self.executions = 0
+    def register(self, code, name=None):
+        key = id(code)
+        if key not in self.codes: self.codes[key] = (name or '<script%d>'%len(self.codes), code)
+        return key
+    def runner(self, code, name=None):
+        key = self.register(code, name)
+        self.executions += 1
+        stats = self.stats
+        clock = time.perf_counter_ns
+        def run(prog, stack, pc, ticks):
+            plain = prog[1]
+            for ticks in range(ticks + 1, runtime.LIMIT + 1):
+                cmd, arg = plain[pc]
+                t = clock()
+                try: npc = cmd(stack, arg, pc)
+                except runtime.VKRuntimeError as e:
+                    if e.pc == None: e.pc = pc
+                    raise
+                finally:
+                    entry = stats[key, pc]
+                    entry[0] += 1
+                    entry[1] += clock() - t
+                pc = npc
+                if pc < 0: return pc, ticks
+            e = runtime.VKRuntimeError('Too many operations')
+            e.pc = pc
+            raise e
+        return run
+    def line(self, code, pc):
+        lines = getattr(code, 'lines', None)
+        return lines[pc][0] if lines != None else None
+    def entries(self):
+        for (key, pc), (count, ns) in self.stats.items():
+            name, code = self.codes[key]
+            yield name, code, pc, code[pc][0], count, ns
+    def by_opcode(self):
+        ans = collections.defaultdict(lambda: [0, 0])
+        for name, code, pc, op, count, ns in self.entries():
+            ans[op][0] += count
+            ans[op][1] += ns
+        return sorted(((k, c, t) for k, (c, t) in ans.items()), key=lambda x: -x[2])
+    def by_line(self):
+        ans = collections.defaultdict(lambda: [0, 0])
+        for name, code, pc, op, count, ns in self.entries():
+            k = (name, self.line(code, pc))
+            ans[k][0] += count
+            ans[k][1] += ns
+        return sorted(((k[0], k[1], c, t) for k, (c, t) in ans.items()), key=lambda x: -x[3])
+    def report(self, file=sys.stdout, limit=20):
+        total = sum(v[1] for v in self.stats.values()) or 1
+        print('%d executions, %d ops, %.3fms'%(self.executions, sum(v[0] for v in self.stats.values()), total / 1e6), file=file)
+        print('\n%-12s %10s %10s %6s'%('opcode', 'count', 'time(us)', '%'), file=file)
+        for op, count, ns in self.by_opcode()[:limit]:
+            print('%-12s %10d %10.1f %6.1f'%(op, count, ns / 1e3, 100 * ns / total), file=file)
+        print('\n%-24s %10s %10s %6s'%('line', 'count', 'time(us)', '%'), file=file)
+        for name, line, count, ns in self.by_line()[:limit]:
+            print('%-24s %10d %10.1f %6.1f'%('%s:%s'%(name, '?' if line == None else line), count, ns / 1e3, 100 * ns / total), file=file)
+    def collapsed(self, file):
+        ans = collections.Counter()
+        for name, code, pc, op, count, ns in self.entries():
+            line = self.line(code, pc)
+            ans['%s;line %s;%s'%(name, '?' if line == None else line, op)] += ns // 1000
+        for k, v in sorted(ans.items()):
+            if v: file.write('%s %d\n'%(k, v))
+    def clear(self):
+        self.codes.clear()
+        self.stats.clear()
+        self.executions = 0
@@ -1,22 +1,34 @@
-import json, collections
+import json, collections, inspect, itertools, math, os
 
-class VKRuntimeError(Exception): pass
+class VKRuntimeError(Exception):
+    pc = line = col = None
+    def __str__(self):
+        ans = super().__str__()
+        if self.line != None: ans += ' (line %d, column %d)'%(self.line, self.col)
+        return ans
 
-class _VKBool:
-    __slots__ = ()
-    def op_is_true(self): return self
-    def __bool__(self): return self
+def locate(e, code, pc=None):
+    if e.pc == None: e.pc = pc
+    lines = getattr(code, 'lines', None)
+    if e.pc != None and e.line == None and lines != None: e.line, e.col = lines[e.pc]
+    return e
+
+LIMIT = 10000
 
 def to_signed(x):
     if x >= 0x80000000: x -= 0x100000000
     return x
 
 class VKCell:
+    __slots__ = ()
     def op_tonumber(self): raise VKRuntimeError('Numeric value is expected')
     def op_tostring(self): return VKString('')
     def op_toobject(self): return VKObject(None)
     def op_torank(self, rank): 
-        if rank == 1: return self.op_tonumber()
+        if rank == 1:
+            ans = self.op_tonumber()
+            if isinstance(ans, VKFloat): ans = VKInt(int(ans.d) if math.isfinite(ans.d) else 0)
+            return ans
         elif rank == 3:
             ans = self.op_tonumber()
             if isinstance(ans, VKInt): ans = VKFloat(float(to_signed(ans.n)))
@@ -26,14 +38,14 @@ class VKCell:
         else: assert False
     def op_is_true(self): return False
     def op_getitem(self, item):
-        return VKNull()
+        return NULL
     def op_setattr(self, attr, value):
         raise VKRuntimeError('setting field ['+attr+'] on not array variable')
     def op_delattr(self, attr):
         raise VKRuntimeError('deleting field ['+attr+'] on not array variable')
     def op_getattr(self, attr):
         if hasattr(self, 'attr_'+attr): return getattr(self, 'attr_'+attr)()
-        return VKNull()
+        return NULL
     def op_attrfilter(self, attr):
         return VKObject(None)
     def op_update(self): pass
@@ -41,24 +53,47 @@ class VKCell:
         return type(self).__name__+'(...)'
     RANK = 7
 
-class VKNull(VKCell): pass
+# null, booleans and small integers are immutable singletons, the constructors hand out the shared instances
+
+class VKNull(VKCell):
+    __slots__ = ()
+    def __new__(cls): return NULL
+
+NULL = object.__new__(VKNull)
 
 class VKBool(VKCell):
-    def __init__(self, b):
-        self.b = b
+    __slots__ = ('b',)
+    def __new__(cls, b): return TRUE if b else FALSE
     def op_tonumber(self): return VKInt(1 if self.b else 0)
     def op_tostring(self): return VKString('1' if self.b else '')
     def op_is_true(self): return self.b
 
+TRUE = object.__new__(VKBool)
+TRUE.b = True
+FALSE = object.__new__(VKBool)
+FALSE.b = False
+
 class VKInt(VKCell):
-    def __init__(self, n):
+    __slots__ = ('n',)
+    def __new__(cls, n):
+        i = (n + 128) & 0xffffffff
+        if i < len(SMALL_INTS): return SMALL_INTS[i]
+        self = object.__new__(cls)
         self.n = n & 0xffffffff
+        return self
     def op_tonumber(self): return self
     def op_tostring(self): return VKString(repr(to_signed(self.n)))
     def op_is_true(self): return self.n != 0
     RANK = 1
 
+SMALL_INTS = []
+for i in range(-128, 1024):
+    SMALL_INTS.append(object.__new__(VKInt))
+    SMALL_INTS[-1].n = i & 0xffffffff
+del i
+
 class VKFloat(VKCell):
+    __slots__ = ('d',)
     def __init__(self, d):
         self.d = d
     def op_tonumber(self): return self
@@ -67,110 +102,174 @@ class VKFloat(VKCell):
     RANK = 3
 
 def to_raw_number(n):
-    if isinstance(n, VKInt): return n.n
+    if isinstance(n, VKInt): return to_signed(n.n)
     elif isinstance(n, VKFloat): return n.d
     else: assert False
 
 class VKString(VKCell):
+    __slots__ = ('s',)
     def __init__(self, s):
         self.s = s
     def op_tonumber(self):
         s = self.s.replace('Infinity', 'inf').replace('NaN', 'nan')
-        try: return VKInt(int(self.s))
+        try: return VKInt(int(s))
         except ValueError:
-            try: return VKFloat(float(self.s))
+            try: return VKFloat(float(s))
             except ValueError: pass
         raise VKRuntimeError('Numeric value is expected')
     def op_tostring(self): return self
     def op_is_true(self): return self.s != ''
-    def attr_length(self): return len(self.s)
+    def attr_length(self): return VKInt(len(self.s))
     def method_substr(self, *args):
         if len(args) not in (1, 2): raise VKRuntimeError('Bad argument count for method substr')
-        a, b = args+(VKInt(0),)
-        try: a = a.op_torank(1).n
-        except: return VKString('')
-        try: b = b.op_torank(1).n
-        except: return VKString('')
+        a, b = (args+(VKInt(len(self.s)),))[:2]
+        try: a = to_signed(a.op_torank(1).n)
+        except VKRuntimeError: return (VKString(''), self)
+        try: b = to_signed(b.op_torank(1).n)
+        except VKRuntimeError: return (VKString(''), self)
         if a < 0: a += len(self.s)
         if a < 0: a = 0
         if b < 0:
             b += len(self.s)
             if b < 0: b = 0
         else: b += a
-        if b < a: return VKString('')
+        if b < a: return (VKString(''), self)
         return (VKString(self.s[a:b]), self)
     def method_split(self, *args):
         if len(args) != 1: raise VKRuntimeError('Bad argument count for method split')
-        sep = args[0].op_tostring()
-        if not sep: return VKObject(None)
-        return (VKObject(None, VKObject.enumerate(map(VKString, self.s.split(sep)))), self)
+        sep = args[0].op_tostring().s
+        if not sep: return (VKObject(None), self)
+        return (VKObject(None, array=map(VKString, self.s.split(sep))), self)
+
+def array_index(key):
+    if key.isascii() and key.isdigit() and (key[0] != '0' or key == '0'): return int(key)
+    return None
+
+# keys '0', '1', ... at the front of an object can live in `array', a list several objects
+# may share copy-on-write, each seeing only its first `size' items; the rest of the keys
+# follow in `data'. While `size' is nonzero `data' holds no numeric keys, objects that
+# don't fit that shape keep everything in `data'
 
 class VKObject(VKCell):
-    def __init__(self, parent, init=()):
+    __slots__ = ('parent', 'array', 'size', 'data', 'shared')
+    def __init__(self, parent, init=(), array=()):
         assert not isinstance(parent, enumerate)
         self.parent = parent
+        self.array = list(array)
+        self.size = len(self.array)
         self.data = collections.OrderedDict(init)
-        for k, v in self.data.items(): v.parent = (self.data, k)
-    @staticmethod
-    def enumerate(x):
-        for i, j in enumerate(x): yield (str(i), j)
-    def op_tostring(self): return VKString(','.join(i.op_tostring() for i in self.data.items()))
+        self.shared = False
+    def _pack(self): #fresh objects only
+        keys = list(self.data)
+        n = 0
+        while n < len(keys) and keys[n] == str(n): n += 1
+        if n and not any(k.isnumeric() for k in keys[n:]):
+            self.array = [self.data.pop(k) for k in keys[:n]]
+            self.size = n
+        return self
+    def _sparse(self): #own first
+        self.data = collections.OrderedDict(self.items())
+        self.array = []
+        self.size = 0
+    def share(self, parent):
+        ans = VKObject.__new__(VKObject)
+        ans.parent = parent
+        ans.array = self.array
+        ans.size = self.size
+        ans.data = self.data
+        ans.shared = self.shared = True
+        return ans
+    def own(self):
+        if self.shared:
+            self.data = collections.OrderedDict(self.data)
+            self.array = self.array[:self.size]
+            self.shared = False
+    def get(self, item):
+        ans = self.data.get(item)
+        if ans == None and self.size:
+            i = array_index(item)
+            if i != None and i < self.size: ans = self.array[i]
+        return ans
+    def items(self):
+        for i in range(self.size): yield (str(i), self.array[i])
+        yield from self.data.items()
+    def values(self):
+        yield from itertools.islice(self.array, self.size)
+        yield from self.data.values()
+    def length(self):
+        return self.size + len(self.data)
+    def __setitem__(self, item, value):
+        if not self.data and array_index(item) == self.size:
+            # appending at the end of our view is invisible to the other views of the list
+            if len(self.array) != self.size: self.array = self.array[:self.size]
+            self.array.append(value)
+            self.size += 1
+            return
+        self.own()
+        if self.size and item not in self.data:
+            i = array_index(item)
+            if i != None and i < self.size:
+                self.array[i] = value
+                return
+            if i != None or item.isnumeric(): self._sparse()
+        self.data[item] = value
+    def __delitem__(self, item):
+        if not self.data and self.size and array_index(item) == self.size - 1:
+            self.size -= 1
+            if not self.shared: self.array.pop()
+            return
+        self.own()
+        if self.size and item not in self.data: self._sparse()
+        del self.data[item]
+    def op_tostring(self): return VKString(','.join(i.op_tostring().s for i in self.values()))
     def op_toobject(self): return self
     def op_getattr(self, item, length=True):
-        if item in self.data: return copy(self.data[item])
-        if item == 'length': return VKInt(len(self.data))
-        return VKNull()
+        ans = self.get(item)
+        if ans != None: return copy(ans, (self, item))
+        if item == 'length': return VKInt(self.length())
+        return NULL
     def op_getitem(self, item):
+        if isinstance(item, VKInt) and to_signed(item.n) < self.size:
+            i = to_signed(item.n)
+            if i >= 0: return copy(self.array[i], (self, str(i)))
         return self.op_getattr(item.op_tostring().s, length=False)
     def op_attrfilter(self, attr):
-        ans = VKObject(None)
-        for k, v in self.data.items():
-            if isinstance(v, VKObject) and attr in v.data:
-                ans.data[k] = copy(v.data[attr])
-            else:
-                ans.data[k] = VKNull()
-        return ans
+        ans = []
+        for v in self.values():
+            v = v.get(attr) if isinstance(v, VKObject) else None
+            ans.append(NULL if v == None else copy(v, None))
+        if not self.data: return VKObject(None, array=ans)
+        return VKObject(None, zip([k for k, v in self.items()], ans))
     def op_setattr(self, item, value):
-        self2 = VKObject(self.parent, self.data.items())
-        self2.data[item] = deepcopy(value, (self2.data, item))
+        self2 = self.share(self.parent)
+        self2[item] = copy(value, None)
         return self2
     def op_delattr(self, item):
-        if item not in self.data: return self
-        self2 = VKObject(self.parent, self.data.items())
-        del self2.data[item]
+        if self.get(item) == None: return self
+        self2 = self.share(self.parent)
+        del self2[item]
         return self2
     def op_update(self):
-#       print('op_update:', self.data)
         if self.parent != None:
             self.parent[0][self.parent[1]] = self
-        for k, v in self.data.items():
-            v.parent = (self.data, k)
-    def op_is_true(self): return len(self.data) != 0
-    def _normalize_array(self): #copy first
-        kv = [(str(i), v) for i, (k, v) in enumerate(self.data.items()) if k.isnumeric()]
-        kv2 = [(k, v) for k, v in self.data.items() if not k.isnumeric()]
-        self.data = collections.OrderedDict(kv+kv2)
-        return len(kv)
-    def _splice(self, arrlen, pos, del_cnt, ins): #normalize first
-        shift_start = pos + del_cnt
-        shift = len(ins) - del_cnt
-        if shift > 0:
-            for i in range(arrlen - 1, shift_start - 1, -1):
-                self.data[str(i + shift)] = self.data[str(i)]
-                self.data[str(i + shift)].parent = (self.data, str(i + shift))
-        elif shift < 0:
-            for i in range(shift_start, arrlen):
-                self.data[str(i + shift)] = self.data[str(i)]
-                self.data[str(i + shift)].parent = (self.data, str(i + shift))
-                del self.data[str(i)]
-        for i, j in enumerate(ins):
-            self.data[str(pos + i)] = deepcopy(j)
-            self.data[str(pos + i)].parent = (self.data, str(pos + i))
+    def op_is_true(self): return self.length() != 0
+    def _normalize_array(self):
+        if not self.size and self.data:
+            kv = [(k, v) for k, v in self.data.items() if not k.isnumeric()]
+            self.array = [v for k, v in self.data.items() if k.isnumeric()]
+            self.size = len(self.array)
+            self.data = collections.OrderedDict(kv)
+            self.shared = False
+        return self.size
+    def _splice(self, pos, del_cnt, ins): #normalize first
+        self.own()
+        self.array[pos:pos + del_cnt] = [copy(j, None) for j in ins]
+        self.size = len(self.array)
     def method_slice(self0, *args):
-        self = copy(self0)
+        self = copy(self0, None)
         l = self._normalize_array()
         if len(args) not in (1, 2): raise VKRuntimeError('Bad argument count for method slice')
-        a, b = args + (None,)
+        a, b = (args + (None,))[:2]
         a = to_raw_number(a.op_tonumber())
         if b != None: b = to_raw_number(b.op_tonumber())
         else: b = l
@@ -181,112 +280,174 @@ class VKObject(VKCell):
             if b < 0: b = 0
         cnt = int((b - a) // 1)
         a = int(a // 1)
-        b = a + cnt
-        ans = []
-        for i in range(a, b):
-            ans.append(deepcopy(self.data[str(i)]))
-        return (VKObject(None, VKObject.enumerate(ans)), self0)
+        b = min(a + cnt, l)
+        ans = [copy(i, None) for i in self.array[a:b]]
+        return (VKObject(None, array=ans), self0)
     def method_push(self, *args):
         if len(args) != 1: raise VKRuntimeError('Bad argument count for method push')
-        idx = max(-1, -1, *(int(k) for k in self.data if k.isnumeric())) + 1
-        return (VKNull(), self.op_setattr(str(idx), deepcopy(args[0])))
+        if self.size or not self.data: idx = self.size
+        else: idx = max(-1, -1, *(int(k) for k in self.data if k.isnumeric())) + 1
+        return (NULL, self.op_setattr(str(idx), args[0]))
     def method_pop(self, *args):
         if len(args) != 0: raise VKRuntimeError('Bad argument count for method pop')
-        try: idx = next(reversed(self.data))
-        except StopIteration: return (VKNull(), self)
-        ans = self.data[idx]
-        ans.parent = None
-        ans = (ans, self.op_delattr(idx))
-        return ans
+        if not self.data:
+            if not self.size: return (NULL, self)
+            idx = str(self.size - 1)
+        else:
+            try: idx = next(reversed(self.data))
+            except StopIteration: return (NULL, self)
+        return (copy(self.get(idx), None), self.op_delattr(idx))
     def method_unshift(self, *args):
         if len(args) != 1: raise VKRuntimeError('Bad argument count for method unshift')
-        self = copy(self)
+        self = copy(self, self.parent)
         self._normalize_array()
         self._splice(0, 0, args)
-        return (VKNull(), self)
+        return (NULL, self)
     def method_shift(self, *args):
         if len(args) != 0: raise VKRuntimeError('Bad argument count for method shift')
-        self = copy(self)
-        self._normalize_array()
-        if '0' not in self.data: return (VKNull(), self)
-        ans = self.data['0']
-        ans.parent = None
+        self = copy(self, self.parent)
+        if not self._normalize_array(): return (NULL, self)
+        ans = copy(self.array[0], None)
         self._splice(0, 1, ())
-        return ans
+        return (ans, self)
     def method_splice(self, *args):
         if len(args) < 2: raise VKRuntimeError('Bad argument count for method splice')
-        self = copy(self)
-        self._normalize_array()
-        start = args[0].op_torank(1).n
-        delcnt = args[1].op_torank(1).n
+        self = copy(self, self.parent)
+        l = self._normalize_array()
+        start = to_signed(args[0].op_torank(1).n)
+        delcnt = to_signed(args[1].op_torank(1).n)
+        if start < 0: start = max(0, start + l)
+        start = min(start, l)
+        delcnt = max(0, min(delcnt, l - start))
         self._splice(start, delcnt, args[2:])
-        return (VKNull(), self)
+        return (NULL, self)
     RANK = 4
 
 class VKUserdata(VKCell):
+    __slots__ = ()
     def op_is_true(self): return True
 
-def outer_to_vkcell(it, parent=None):
+def outer_scalar(it):
     if isinstance(it, VKCell): return it
-    elif isinstance(it, bool): return VKBool(it)
+    elif isinstance(it, bool): return TRUE if it else FALSE
     elif isinstance(it, int): return VKInt(it)
     elif isinstance(it, float): return VKFloat(it)
     elif isinstance(it, str): return VKString(it)
-    elif isinstance(it, list):
-        ans = VKObject(parent)
-        for i, j in enumerate(it):
-            ans.data[str(i)] = outer_to_vkcell(j, (ans.data, str(i)))
-    elif isinstance(it, dict):
-        ans = VKObject(parent)
-        for k, v in it.items():
-            k = str(k)
-            ans.data[k] = outer_to_vkcell(v, (ans.data, k))
-    elif it is None: return VKNull()
+    elif it is None: return NULL
     else:
         raise TypeError("can't convert %r to VKCell"%it)
+
+# both conversions walk nested objects with an explicit stack, so deeply nested
+# values can't run into the recursion limit
+
+def outer_to_vkcell(it, parent=None):
+    if not isinstance(it, (list, dict)): return outer_scalar(it)
+    ans = VKObject(parent)
+    stack = [(ans, it)]
+    def convert(v):
+        f = BOX.get(type(v))
+        if f != None: return f(v)
+        elif isinstance(v, (list, dict)):
+            stack.append((VKObject(None), v))
+            return stack[-1][0]
+        return outer_scalar(v)
+    while stack:
+        obj, it = stack.pop()
+        if isinstance(it, list):
+            obj.array = list(map(convert, it))
+            obj.size = len(obj.array)
+        else:
+            for k, v in it.items(): obj.data[str(k)] = convert(v)
     return ans
 
+def is_array(it):
+    return not it.data or not it.size and all(k == str(i) for i, k in enumerate(it.data))
+
 def vkcell_to_outer(it):
-    if isinstance(it, _VKBool): return bool(it)
-    elif isinstance(it, VKBool): return it.b
-    elif isinstance(it, VKInt): return to_signed(it.n)
-    elif isinstance(it, VKFloat): return it.d
-    elif isinstance(it, VKString): return it.s
-    elif isinstance(it, VKObject):
-        if list(it.data) == list(map(str, range(len(it.data)))):
-            return list(map(vkcell_to_outer, it.data.values()))
+    if type(it) in NATIVE: return it
+    elif not isinstance(it, VKObject): return UNBOX[type(it)](it)
+    ans = [] if is_array(it) else {}
+    stack = [(ans, it)]
+    def convert(v):
+        f = UNBOX.get(type(v))
+        if f != None: return f(v)
+        assert isinstance(v, VKObject), v
+        stack.append(([] if is_array(v) else {}, v))
+        return stack[-1][0]
+    while stack:
+        out, it = stack.pop()
+        if type(out) is list: out.extend(map(convert, it.values()))
         else:
-            return {k: vkcell_to_outer(v) for k, v in it.data.items()}
-    elif isinstance(it, VKNull): return None
-    else: assert False, it
-
-#def copy(x):
-#    if isinstance(x, VKObject): return VKObject(x.parent, x.data.items())
-#    else: return x
-
-def deepcopy(x, parent=123):
-    if isinstance(x, VKObject):
-        if parent == 123: parent = x.parent
-        ans = VKObject(parent)
-        for k, v in x.data.items():
-            ans.data[k] = deepcopy(v, (ans.data, k))
-        return ans
+            for k, v in it.items(): out[k] = convert(v)
+    return ans
+
+# on the VM stack null, booleans, numbers and strings are kept as plain None, bool, int
+# (signed 32-bit), float and str; they are boxed into cells only to enter objects and methods
+
+NATIVE = frozenset((type(None), bool, int, float, str))
+BOX = {int: VKInt, str: VKString, float: VKFloat, bool: VKBool, type(None): lambda x: NULL}
+UNBOX = {VKInt: lambda x: to_signed(x.n), VKString: lambda x: x.s, VKFloat: lambda x: x.d, VKBool: lambda x: x.b, VKNull: lambda x: None}
+
+def box(x):
+    f = BOX.get(type(x))
+    return x if f == None else f(x)
+
+def unbox(x):
+    f = UNBOX.get(type(x))
+    return x if f == None else f(x)
+
+def wrap(n):
+    return (n + 0x80000000 & 0xffffffff) - 0x80000000
+
+def outer_to_value(it, parent=None):
+    return unbox(outer_to_vkcell(it, parent))
+
+def truth(x):
+    if type(x) in NATIVE: return bool(x)
+    return x.op_is_true()
+
+# objects are already cells, so they skip box() on the way in
+
+def get_attr(x, attr):
+    if type(x) is not VKObject: x = box(x)
+    return unbox(x.op_getattr(attr))
+
+def get_item(x, item):
+    if type(x) is not VKObject: x = box(x)
+    return unbox(x.op_getitem(box(item)))
+
+def set_attr(x, attr, value):
+    if type(x) is not VKObject: x = box(x)
+    return x.op_setattr(attr, box(value))
+
+def del_attr(x, attr):
+    return box(x).op_delattr(attr)
+
+def filter_attr(x, attr):
+    return box(x).op_attrfilter(attr)
+
+def call_method(this, name, args):
+    if type(this) is not VKObject: this = box(this)
+    if not hasattr(this, name):
+        raise VKRuntimeError('Bad method name')
+    ans, this = getattr(this, name)(*map(box, args))
+    return unbox(ans), unbox(this)
+
+def copy(x, parent):
+    if isinstance(x, VKObject): return x.share(parent)
     else: return x
-copy = deepcopy
 
 def NoAPI(func, args):
     raise VKRuntimeError('No API!')
 
 def numeric_op(f):
     def wrapper(*args):
-        for i in args: i = i.op_tonumber()
-        return f(*args)
+        return f(*(i.op_tonumber() for i in args))
     return wrapper
 
 def int_op(f):
     def wrapper(*args):
-        for i in args: i = i.op_torank(1)
-        return f(*args)
+        return f(*(i.op_torank(1) for i in args))
     return wrapper
 
 def ranked_op(f):
@@ -301,10 +462,7 @@ def op_add(rank, a, b):
     if rank == 1: return VKInt((a.n + b.n) & 0xffffffff)
     elif rank == 3: return VKFloat(a.d + b.d)
     elif rank == 4:
-        ans = VKObject(None)
-        for k, v in a.data.items(): ans.data[k] = v
-        for k, v in b.data.items(): ans.data[k] = v
-        return ans
+        return VKObject(None, itertools.chain(a.items(), b.items()))._pack()
     elif rank == 7: return VKString(a.s + b.s)
     else: assert False
 
@@ -317,7 +475,7 @@ def simple_math_op(op, opname, signed=False, int_only=False):
 @ranked_op
 def op_{opname}(rank, a, b):
     if rank == 1: return VKInt(({a} {op} {b}))
-    elif rank == 3: return VKFloat(a.f {op} b.f)
+    elif rank == 3: return VKFloat(a.d {op} b.d)
     else: assert False
 ''' if not int_only else '''
 @int_op
@@ -328,12 +486,35 @@ def op_{opname}(a, b):
 
 op_sub = simple_math_op('-', 'sub')
 op_mul = simple_math_op('*', 'mul')
-op_div = simple_math_op('/', 'div', signed=True)
-op_mod = simple_math_op('%', 'mod', signed=True, int_only=True)
 op_bitand = simple_math_op('&', 'and', int_only=True)
 op_bitor = simple_math_op('|', 'or', int_only=True)
-op_bitshl = simple_math_op('<<', 'bitshl', int_only=True)
-op_bitshr = simple_math_op('>>', 'bitshr', signed=True, int_only=True)
+
+@int_op
+def op_bitshl(a, b):
+    return VKInt(a.n << (b.n & 31))
+
+@int_op
+def op_bitshr(a, b):
+    return VKInt(to_signed(a.n) >> (b.n & 31))
+
+@numeric_op
+@ranked_op
+def op_div(rank, a, b):
+    if rank == 1:
+        a, b = to_signed(a.n), to_signed(b.n)
+        if b == 0: raise VKRuntimeError('Division by zero')
+        if a % b == 0: return VKInt(a // b)
+        return VKFloat(a / b)
+    elif rank == 3:
+        if b.d == 0: raise VKRuntimeError('Division by zero')
+        return VKFloat(a.d / b.d)
+    else: assert False
+
+@int_op
+def op_mod(a, b):
+    a, b = to_signed(a.n), to_signed(b.n)
+    if b == 0: raise VKRuntimeError('Division by zero')
+    return VKInt(int(math.fmod(a, b)))
 
 def compare_op(op, opname):
     locals = {}
@@ -351,13 +532,14 @@ def op_{opname}(a, b):
         a = a.op_torank(a.RANK | b.RANK)
         b = b.op_torank(a.RANK | b.RANK)
         if rank == 1:
-            return _VKBool(to_signed(a.n) {op} to_signed(b.n))
+            return TRUE if to_signed(a.n) {op} to_signed(b.n) else FALSE
         elif rank == 3:
-            return _VKBool(a.f {op} b.f)
+            return TRUE if a.d {op} b.d else FALSE
         else: assert False
+    elif isinstance(a, VKString) and isinstance(b, VKString):
+        return TRUE if a.s {op} b.s else FALSE
     else:
-        assert isinstance(a, VKString) and isinstance(b, VKString)
-        return _VKBool(a.s {op} b.s)
+        return TRUE if a.op_tostring().s {op} b.op_tostring().s else FALSE
 '''.format(opname=opname, op=op), globals(), locals)
     return locals['op_'+opname]
 
@@ -369,7 +551,7 @@ op_le = compare_op('<=', 'le')
 op_lt = compare_op('<', 'lt')
 
 def op_not(arg):
-    return _VKBool(not arg.op_is_true())
+    return FALSE if arg.op_is_true() else TRUE
 
 @int_op
 def op_invert(arg):
@@ -378,12 +560,12 @@ def op_invert(arg):
 @numeric_op
 def op_negate(arg):
     if isinstance(arg, VKInt): return VKInt(0x100000000 - arg.n)
-    elif isinstance(arg, VKFloat): return VKFloat(-arg.f)
+    elif isinstance(arg, VKFloat): return VKFloat(-arg.d)
     else: assert False
 
 def op_parseInt(arg):
     arg = arg.op_tostring()
-    i = len(arg)
+    i = len(arg.s)
     while i > 0:
         try: return VKInt(int(arg.s[:i]))
         except ValueError: i -= 1
@@ -391,36 +573,96 @@ def op_parseInt(arg):
 
 def op_parseFloat(arg):
     arg = arg.op_tostring()
-    i = len(arg)
+    i = len(arg.s)
     while i > 0:
         try: return VKFloat(float(arg.s[:i]))
         except ValueError: i -= 1
     return VKFloat(0.0)
 
+def boxed_op(f):
+    def wrapper(*args):
+        return unbox(f(*map(box, args)))
+    return wrapper
+
+def fast_op(opname, f, body, mixed=''):
+    # operands of the same plain type take `body', everything else goes through the cell operator
+    locals = {}
+    exec('''
+def fast_{opname}(a, b):
+    t = type(a)
+    if t is type(b):
+{body}
+{mixed}
+    return unbox(f(box(a), box(b)))
+'''.format(opname=opname, body=body, mixed=mixed), {**globals(), 'f': f}, locals)
+    return locals['fast_'+opname]
+
+def fast_math_op(op, opname, f, types, mixed=''):
+    return fast_op(opname, f, '''        if t is int:
+            a = a {op} b
+            return a if -0x80000000 <= a <= 0x7fffffff else wrap(a)
+        if {types}: return a {op} b'''.format(op=op, types=' or '.join('t is '+i for i in types)), mixed)
+
+def fast_int_op(expr, opname, f):
+    return fast_op(opname, f, '        if t is int: return '+expr)
+
+def fast_compare_op(op, opname, f):
+    return fast_op(opname, f, '        if t is int or t is float or t is str: return a {op} b'.format(op=op))
+
+fast_add = fast_math_op('+', 'add', op_add, ('float', 'str'), '''    elif t is str and type(b) is int: return a + repr(b)
+    elif t is int and type(b) is str: return repr(a) + b''')
+fast_sub = fast_math_op('-', 'sub', op_sub, ('float',))
+fast_mul = fast_math_op('*', 'mul', op_mul, ('float',))
+fast_div = fast_op('div', op_div, '''        if t is int or t is float:
+            if b == 0: raise VKRuntimeError('Division by zero')
+            if t is int and a % b == 0: return wrap(a // b)
+            return a / b''')
+fast_mod = fast_op('mod', op_mod, '''        if t is int:
+            if b == 0: raise VKRuntimeError('Division by zero')
+            return int(math.fmod(a, b))''')
+fast_bitand = fast_int_op('a & b', 'bitand', op_bitand)
+fast_bitor = fast_int_op('a | b', 'bitor', op_bitor)
+fast_bitshl = fast_int_op('wrap(a << (b & 31))', 'bitshl', op_bitshl)
+fast_bitshr = fast_int_op('a >> (b & 31)', 'bitshr', op_bitshr)
+
+def fast_not(arg):
+    return not truth(arg)
+
+def fast_invert(arg):
+    if type(arg) is int: return ~arg
+    return unbox(op_invert(box(arg)))
+
+def fast_negate(arg):
+    t = type(arg)
+    if t is int: return wrap(-arg)
+    if t is float: return -arg
+    return unbox(op_negate(box(arg)))
+
 binops = {
-    '+': op_add,
-    '-': op_sub,
-    '*': op_mul,
-    '/': op_div,
-    '%': op_mod,
-    '&': op_bitand,
-    '|': op_bitor,
-    '<<': op_bitshl,
-    '>>': op_bitshr,
-    '==': op_eq,
-    '!=': op_eq,
-    '>=': op_ge,
-    '>': op_gt,
-    '<=': op_le,
-    '<': op_lt
+    '+': fast_add,
+    '-': fast_sub,
+    '*': fast_mul,
+    '/': fast_div,
+    '%': fast_mod,
+    '&': fast_bitand,
+    '|': fast_bitor,
+    '<<': fast_bitshl,
+    '>>': fast_bitshr,
+    '==': fast_compare_op('==', 'eq', op_eq),
+    '!=': fast_compare_op('!=', 'ne', op_ne),
+    '>=': fast_compare_op('>=', 'ge', op_ge),
+    '>': fast_compare_op('>', 'gt', op_gt),
+    '<=': fast_compare_op('<=', 'le', op_le),
+    '<': fast_compare_op('<', 'lt', op_lt)
 }
 
 unaryops = {
-    '!': op_not,
-    '~': op_invert,
-    '-': op_negate,
-    'parseInt': op_parseInt,
-    'parseFloat': op_parseFloat
+    '!': fast_not,
+    '~': fast_invert,
+    '-': fast_negate,
+    'parseInt': boxed_op(op_parseInt),
+    'parseFloat': boxed_op(op_parseFloat),
+    'parseDouble': boxed_op(op_parseFloat)
 }
 
 def lastn(a, b):
@@ -430,82 +672,285 @@ def lastn(a, b):
         return ans
     return []
 
+def cmd_return(stack, arg, pc):
+    return -1
+
+def cmd_binop(stack, op, pc):
+    arg2 = stack.pop()
+    stack[-1] = op(stack[-1], arg2)
+    return pc + 1
+
+def cmd_unaryop(stack, op, pc):
+    stack[-1] = op(stack[-1])
+    return pc + 1
+
+def cmd_and(stack, target, pc):
+    if not truth(stack[-1]): return target
+    stack.pop()
+    return pc + 1
+
+def cmd_or(stack, target, pc):
+    if truth(stack[-1]): return target
+    stack.pop()
+    return pc + 1
+
+def cmd_pop(stack, arg, pc):
+    stack.pop()
+    return pc + 1
+
+def cmd_popn(stack, n, pc):
+    lastn(stack, n)
+    return pc + 1
+
+def cmd_pushc(stack, value, pc):
+    stack.append(value)
+    return pc + 1
+
+def cmd_makearr(stack, n, pc):
+    values = lastn(stack, n)
+    stack.append(VKObject(None, array=map(box, values)))
+    return pc + 1
+
+def cmd_makeobj(stack, keys, pc):
+    values = lastn(stack, len(keys))
+    stack.append(VKObject(None, zip(keys, map(box, values))))
+    return pc + 1
+
+def cmd_apicall(stack, arg, pc):
+    return -2 - pc
+
+def cmd_methodcall(stack, arg, pc):
+    name, n = arg
+    values = lastn(stack, n)
+    stack.extend(call_method(stack.pop(), name, values))
+    return pc + 1
+
+def cmd_arrayget(stack, arg, pc):
+    index = stack.pop()
+    stack[-1] = get_item(stack[-1], index)
+    return pc + 1
+
+def cmd_attrget(stack, attr, pc):
+    stack[-1] = get_attr(stack[-1], attr)
+    return pc + 1
+
+def cmd_attrset(stack, attr, pc):
+    value = stack.pop()
+    obj = stack.pop()
+    stack.append(value)
+    stack.append(set_attr(obj, attr, value))
+    if isinstance(value, VKObject): value.parent = (stack[-1], attr)
+    return pc + 1
+
+def cmd_delattr(stack, attr, pc):
+    stack[-1] = del_attr(stack[-1], attr)
+    return pc + 1
+
+def cmd_update(stack, arg, pc):
+    obj = stack.pop()
+    if type(obj) is VKObject: obj.op_update()
+    return pc + 1
+
+def cmd_attrfilter(stack, attr, pc):
+    stack[-1] = filter_attr(stack[-1], attr)
+    return pc + 1
+
+def cmd_pjif(stack, target, pc):
+    if truth(stack.pop()): return pc + 1
+    return target
+
+def cmd_goto(stack, target, pc):
+    return target
+
+def cmd_putfast(stack, idx, pc):
+    stack[idx] = copy(stack[-1], (stack, idx))
+    return pc + 1
+
+def cmd_clrfast(stack, idx, pc):
+    stack[idx] = None
+    return pc + 1
+
+def cmd_loadfast(stack, idx, pc):
+    stack.append(copy(stack[idx], (stack, idx)))
+    return pc + 1
+
+commands = {k[4:]: v for k, v in globals().items() if k.startswith('cmd_')}
+
+def super_loadfast_pushc_binop(stack, arg, pc):
+    idx, value, op = arg
+    try: stack.append(op(stack[idx], value))
+    except VKRuntimeError as e:
+        e.pc = pc + 2
+        raise
+    return pc + 3
+
+def super_loadfast_loadfast_binop(stack, arg, pc):
+    idx1, idx2, op = arg
+    try: stack.append(op(stack[idx1], stack[idx2]))
+    except VKRuntimeError as e:
+        e.pc = pc + 2
+        raise
+    return pc + 3
+
+def super_binop_putfast_pop(stack, arg, pc):
+    op, idx = arg
+    arg2 = stack.pop()
+    stack[idx] = copy(op(stack.pop(), arg2), (stack, idx))
+    return pc + 3
+
+def super_binop_pjif(stack, arg, pc):
+    op, target = arg
+    arg2 = stack.pop()
+    if truth(op(stack.pop(), arg2)): return pc + 2
+    return target
+
+def super_putfast_pop(stack, idx, pc):
+    value = stack.pop()
+    if isinstance(value, VKObject): value.parent = (stack, idx)
+    stack[idx] = value
+    return pc + 2
+
+def super_loadfast_attrget(stack, arg, pc):
+    idx, attr = arg
+    try: stack.append(get_attr(copy(stack[idx], (stack, idx)), attr))
+    except VKRuntimeError as e:
+        e.pc = pc + 1
+        raise
+    return pc + 2
+
+def super_pushc_binop(stack, arg, pc):
+    value, op = arg
+    try: stack[-1] = op(stack[-1], value)
+    except VKRuntimeError as e:
+        e.pc = pc + 1
+        raise
+    return pc + 2
+
+superinstructions = {tuple(k[6:].split('_')): v for k, v in globals().items() if k.startswith('super_')}
+
+def const_key(value):
+    return (float, repr(value)) if isinstance(value, float) else (type(value), value)
+
+def prepare(code):
+    ans = []
+    consts = {}
+    for cmd, *args in code:
+        if cmd not in commands: raise VKRuntimeError('Unknown command: '+cmd)
+        if cmd == 'pushc':
+            key = const_key(args[0])
+            if key not in consts: consts[key] = outer_to_value(args[0])
+            arg = consts[key]
+        elif cmd == 'binop': arg = binops[args[0]]
+        elif cmd == 'unaryop': arg = unaryops[args[0]]
+        elif cmd == 'methodcall': arg = ('method_'+args[0], args[1])
+        elif args: arg = args[0]
+        else: arg = None
+        ans.append((commands[cmd], arg))
+    return ans
+
+def fuse(code, plain):
+    targets = {i[1] for i in code if i[0] in ('and', 'or', 'pjif', 'goto')}
+    ans = []
+    for pc, (cmd, arg) in enumerate(plain):
+        for n in (3, 2):
+            seq = tuple(i[0] for i in code[pc:pc+n])
+            if seq in superinstructions and not any(i in targets for i in range(pc + 1, pc + n)):
+                args = tuple(j[1] for i, j in zip(code[pc:pc+n], plain[pc:pc+n]) if len(i) > 1)
+                ans.append((superinstructions[seq], args[0] if len(args) == 1 else args, n))
+                break
+        else: ans.append((cmd, arg, 1))
+    return ans
+
+def prepared(code):
+    ans = getattr(code, 'prepared', None)
+    if ans == None:
+        plain = prepare(code)
+        ans = (fuse(code, plain), plain)
+        try: code.prepared = ans
+        except AttributeError: pass
+    return ans
+
+# raises explicitly, so checked mode still checks under python -O
+def check(stack):
+    for i in stack:
+        if isinstance(i, VKObject) and not all(isinstance(j, str) for j, k in i.items()):
+            raise AssertionError('non-string key in an object on the stack')
+    if len(set(id(x) for x in stack if isinstance(x, VKObject))) != sum(1 for x in stack if isinstance(x, VKObject)):
+        raise AssertionError('one object in several stack slots')
+
+def run(prog, stack, pc, ticks):
+    fused, plain = prog
+    try:
+        while True:
+            cmd, arg, n = fused[pc]
+            ticks += n
+            if ticks > LIMIT: break
+            pc = cmd(stack, arg, pc)
+            if pc < 0: return pc, ticks
+        for ticks in range(ticks - n + 1, LIMIT + 1):
+            cmd, arg = plain[pc]
+            pc = cmd(stack, arg, pc)
+            if pc < 0: return pc, ticks
+        raise VKRuntimeError('Too many operations')
+    except VKRuntimeError as e:
+        if e.pc == None: e.pc = pc
+        raise
+
+def run_checked(prog, stack, pc, ticks):
+    plain = prog[1]
+    try:
+        for ticks in range(ticks + 1, LIMIT + 1):
+            check(stack)
+            cmd, arg = plain[pc]
+            pc = cmd(stack, arg, pc)
+            if pc < 0: return pc, ticks
+        raise VKRuntimeError('Too many operations')
+    except VKRuntimeError as e:
+        if e.pc == None: e.pc = pc
+        raise
+
+CHECKED = os.environ.get('VKSCRIPT_CHECKED', '') not in ('', '0')
+
+def execute(code, args=None, rpc=NoAPI, checked=None, profile=None, convert=vkcell_to_outer):
+    if args == None: args = {}
+    if checked == None: checked = CHECKED
+    loop = profile.runner(code) if profile != None else run_checked if checked else run
+    stack = []
+    stack.append(outer_to_value(args, (stack, 0)))
+    try: return convert(resume(code, prepared(code), stack, 0, 0, rpc, loop))
+    except VKRuntimeError as e: raise locate(e, code)
+
+def resume(code, prog, stack, pc, ticks, rpc, loop):
+    while True:
+        pc, ticks = loop(prog, stack, pc, ticks)
+        if pc == -1: return stack[-1]
+        pc = -2 - pc
+        try: stack.append(outer_to_value(rpc(code[pc][1], vkcell_to_outer(stack.pop()))))
+        except VKRuntimeError as e: raise locate(e, code, pc)
+        pc += 1
+
 def exec(*pargs, **args):
-    code = pargs[0]
-    rpc = pargs[1] if len(pargs) > 1 else NoAPI
+    return execute(pargs[0], args, *pargs[1:])
+
+async def async_execute(code, args=None, rpc=NoAPI, checked=None, convert=vkcell_to_outer):
+    if args == None: args = {}
+    if checked == None: checked = CHECKED
     stack = []
-    stack.append(outer_to_vkcell(args, (stack, 0)))
-    ticks = 0
-    pc = 0
-    while ticks < 10000:
-        for i in stack:
-            assert not isinstance(i, VKObject) or all(isinstance(j, str) for j in i.data)
-        assert len(set(id(x) for x in stack if isinstance(x, VKObject))) == sum(1 for x in stack if isinstance(x, VKObject))
-#       print(pc, code[pc])
-#       print(stack)
-#       print([getattr(i, 'parent', None) for i in stack])
-        ticks += 1
-        cmd, *args = code[pc]
-        if cmd == 'return':
-            return vkcell_to_outer(stack[-1])
-        elif cmd == 'binop':
-            arg2 = stack.pop()
-            arg1 = stack.pop()
-            stack.append(binops[args[0]](arg1, arg2))
-        elif cmd == 'unaryop':
-            stack.append(unaryops[args[0]](stack.pop()))
-        elif cmd in ('and', 'or'):
-            if (cmd == 'or') == stack[-1].op_is_true():
-                pc = args[0]
-                continue
-            stack.pop()
-        elif cmd == 'pop':
-            stack.pop()
-        elif cmd == 'popn':
-            lastn(stack, args[0])
-        elif cmd == 'pushc':
-            stack.append(outer_to_vkcell(args[0]))
-        elif cmd == 'makearr':
-            values = lastn(stack, args[0])
-            stack.append(VKObject(None, VKObject.enumerate(values)))
-        elif cmd == 'makeobj':
-            values = lastn(stack, len(args[0]))
-            stack.append(VKObject(None, zip(args[0], values)))
-        elif cmd == 'apicall':
-            stack.append(rpc(stack.pop()))
-        elif cmd == 'methodcall':
-            values = lastn(stack, args[1])
-            this = stack.pop()
-            if not hasattr(this, 'method_'+args[0]):
-                raise VKRuntimeError('Bad method name')
-            stack.extend(getattr(this, 'method_'+args[0])(*values))
-        elif cmd == 'arrayget':
-            index = stack.pop()
-            array = stack.pop()
-            stack.append(copy(array.op_getitem(index)))
-        elif cmd == 'attrget':
-            stack.append(copy(stack.pop().op_getattr(args[0])))
-        elif cmd == 'attrset':
-            value = copy(stack.pop())
-            obj = stack.pop()
-            stack.append(value)
-            stack.append(obj.op_setattr(args[0], value))
-            value.parent = (stack[-1].data, args[0])
-        elif cmd == 'update':
-            stack.pop().op_update()
-        elif cmd == 'attrfilter':
-            stack.append(stack.pop().op_attrfilter(args[0]))
-        elif cmd == 'pjif':
-            if stack.pop().op_is_true(): pc = args[0]
-        elif cmd == 'goto':
-            pc = args[0]
-        elif cmd == 'putfast':
-            stack[args[0]] = deepcopy(stack[-1], (stack, args[0]))
-        elif cmd == 'clrfast':
-            stack[args[0]] = VKNull()
-        elif cmd == 'loadfast':
-            stack.append(deepcopy(stack[args[0]], (stack, args[0])))
-        else: assert False
+    stack.append(outer_to_value(args, (stack, 0)))
+    try: return convert(await async_resume(code, prepared(code), stack, 0, 0, rpc, run_checked if checked else run))
+    except VKRuntimeError as e: raise locate(e, code)
+
+async def async_resume(code, prog, stack, pc, ticks, rpc, loop):
+    while True:
+        pc, ticks = loop(prog, stack, pc, ticks)
+        if pc == -1: return stack[-1]
+        pc = -2 - pc
+        try:
+            ans = rpc(code[pc][1], vkcell_to_outer(stack.pop()))
+            if inspect.isawaitable(ans): ans = await ans
+        except VKRuntimeError as e: raise locate(e, code, pc)
+        stack.append(outer_to_value(ans))
         pc += 1
-    raise VKRuntimeError('Too many operations')
-#   print('stuck at pc', pc)
+
+def async_exec(*pargs, **args):
+    return async_execute(pargs[0], args, *pargs[1:])
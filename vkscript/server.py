@@ -0,0 +1,182 @@
+import argparse, collections, http.server, json, multiprocessing, os, queue, signal, socketserver, sys, threading
+import vkscript, vkscript.encoder as encoder, vkscript.fakeapi as fakeapi, vkscript.runtime as runtime
+from vkscript.cache import CompileCache
+
+# POST / {"code": ..., "args": ..., "ops": ..., "timeout": ...} runs the script in one of the
+# pre-forked workers and answers {"result": ...} or {"error": ...}, GET /stats shows the counters.
+# ops and timeout can only lower the server's limits. A worker that misses its deadline by more
+# than GRACE seconds is killed and replaced, a request that finds all workers busy and the queue
+# full is turned away with 503
+
+GRACE = 1.0
+
+cache = None
+rpc = runtime.NoAPI
+
+def dumps(obj):
+    return json.dumps(obj, separators=(',', ':')).encode('ascii')
+
+def error(message, status=200):
+    return status, dumps({'error': message})
+
+def alarm(signum, frame):
+    raise runtime.VKRuntimeError('Time limit exceeded')
+
+def handle(body, config):
+    try:
+        req = json.loads(body)
+        code, args = req['code'], req.get('args')
+        ops = min(int(req.get('ops', config.ops)), config.ops)
+        timeout = min(float(req.get('timeout', config.timeout)), config.timeout)
+        if not isinstance(code, str): raise TypeError('code is not a string')
+        if not timeout > 0: raise ValueError('timeout is not positive')
+    except (ValueError, TypeError, KeyError, AttributeError, OverflowError) as e: return error('Bad request: %s'%e, 400)
+    # anything the compiler raises is a mistake in the script, not a fault of the server
+    try: code = cache.get(code)
+    except Exception as e: return error('%s: %s'%(type(e).__name__, e))
+    runtime.LIMIT = ops
+    # the timer is stopped inside the try, so an alarm that fires late is still caught
+    try:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try: ans = vkscript.execute(code, args, rpc, engine=config.engine, convert=encoder.dumps)
+        finally: signal.setitimer(signal.ITIMER_REAL, 0)
+    except runtime.VKRuntimeError as e: return error('VKRuntimeError: %s'%e)
+    finally: runtime.LIMIT = config.ops
+    return 200, b'{"result":'+ans+b'}'
+
+def serve(conn, config):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGALRM, alarm)
+    while True:
+        try: body = conn.recv_bytes()
+        except EOFError: return
+        try: ans = handle(body, config)
+        except Exception as e: ans = error('%s: %s'%(type(e).__name__, e), 500)
+        conn.send(ans)
+
+class Worker:
+    def __init__(self, config):
+        self.config = config
+        self.start()
+    def start(self):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.get_context('fork').Process(target=serve, args=(child, self.config), daemon=True)
+        self.process.start()
+        child.close()
+    def restart(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.start()
+    def call(self, body):
+        try:
+            self.conn.send_bytes(body)
+            if self.conn.poll(self.config.timeout + GRACE): return self.conn.recv() + (True,)
+        except (EOFError, OSError): return error('Worker died', 500) + (False,)
+        return error('Time limit exceeded', 504) + (False,)
+
+class Pool:
+    def __init__(self, config):
+        self.idle = queue.Queue()
+        self.dead = queue.Queue()
+        self.slots = threading.BoundedSemaphore(config.workers + config.queue)
+        self.stats = collections.Counter()
+        self.lock = threading.Lock()
+        self.workers = [Worker(config) for i in range(config.workers)]
+        for i in self.workers: self.idle.put(i)
+    def call(self, body):
+        if not self.slots.acquire(False):
+            self.count('rejected')
+            return error('Server is busy', 503)
+        try:
+            worker = self.idle.get()
+            status, ans, alive = worker.call(body)
+            (self.idle if alive else self.dead).put(worker)
+        finally: self.slots.release()
+        self.count(status)
+        return status, ans
+    def count(self, key):
+        with self.lock: self.stats[key] += 1
+    def supervise(self):
+        while True:
+            worker = self.dead.get()
+            worker.restart()
+            self.count('restarts')
+            self.idle.put(worker)
+    def close(self):
+        for i in self.workers: i.process.kill()
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+    def do_POST(self):
+        try: n = int(self.headers['Content-Length'])
+        except (TypeError, ValueError): return self.reply(*error('Content-Length required', 411))
+        self.reply(*self.server.pool.call(self.rfile.read(n)))
+    def do_GET(self):
+        if self.path != '/stats': return self.reply(*error('Not found', 404))
+        pool = self.server.pool
+        with pool.lock: stats = {str(k): v for k, v in pool.stats.items()}
+        self.reply(200, dumps({'workers': len(pool.workers), 'idle': pool.idle.qsize(), 'requests': stats}))
+    def reply(self, status, data):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if status == 503: self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(data)
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+    def log_message(self, *args):
+        if self.server.verbose: super().log_message(*args)
+
+class TCPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def main():
+    global cache, rpc
+    ap = argparse.ArgumentParser(prog='python -m vkscript.server')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8080)
+    ap.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead of TCP')
+    ap.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--queue', type=int, default=64, help='requests that may wait for a worker before new ones get 503')
+    ap.add_argument('--ops', type=int, default=runtime.LIMIT, help='operation limit per request')
+    ap.add_argument('--timeout', type=float, default=1.0, help='time limit per request, in seconds')
+    ap.add_argument('--engine', choices=sorted(vkscript.engines))
+    ap.add_argument('--cache-size', type=int, default=1024)
+    ap.add_argument('--cache-dir', help='keep compiled scripts here, shared by all workers and restarts')
+    ap.add_argument('--preload', nargs='*', default=[], metavar='FILE', help='compile these scripts before forking the workers')
+    ap.add_argument('--replay', metavar='FILE', help='answer API calls from responses recorded in FILE')
+    ap.add_argument('--synthetic', action='store_true', help='answer API calls with generated responses')
+    ap.add_argument('--latency', type=float, default=0, help='delay of every fake API call, in seconds')
+    ap.add_argument('--verbose', '-v', action='store_true')
+    config = ap.parse_args()
+    cache = CompileCache(config.cache_size, config.cache_dir)
+    for i in config.preload:
+        with open(i) as file: cache.get(file.read())
+    if config.replay: rpc = fakeapi.Replay(config.replay, config.latency)
+    elif config.synthetic: rpc = fakeapi.Synthetic(latency=config.latency)
+    if config.unix:
+        if os.path.exists(config.unix): os.unlink(config.unix)
+        server = UnixServer(config.unix, Handler)
+    else: server = TCPServer((config.host, config.port), Handler)
+    server.verbose = config.verbose
+    server.pool = Pool(config)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print('listening on %s'%(config.unix or '%s:%d'%server.server_address[:2]), file=sys.stderr, flush=True)
+    try: server.pool.supervise()
+    except (KeyboardInterrupt, SystemExit): pass
+    finally:
+        server.pool.close()
+        server.server_close()
+        if config.unix: os.unlink(config.unix)
+
+if __name__ == '__main__':
+    main()
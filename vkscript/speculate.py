@@ -0,0 +1,114 @@
+import concurrent.futures
+import vkscript.runtime as runtime, vkscript.translate as translate
+
+CONSUMES = {'binop': 2, 'unaryop': 1, 'arrayget': 2, 'attrget': 1, 'attrset': 2, 'attrfilter': 1, 'delattr': 1}
+
+class Pending:
+    def __init__(self, future, pc):
+        self.future = future
+        self.pc = pc
+    def result(self, code):
+        try: return self.future.result()
+        except runtime.VKRuntimeError as e: raise runtime.locate(e, code, self.pc)
+
+def consumes(instr):
+    cmd = instr[0]
+    if cmd == 'makearr': return instr[1]
+    elif cmd == 'makeobj': return len(instr[1])
+    elif cmd == 'methodcall': return instr[2] + 1
+    return CONSUMES.get(cmd, 0)
+
+def region(code, depth, pc):
+    tainted = {depth[pc] - 1}
+    calls = []
+    for pc in range(pc + 1, len(code)):
+        cmd, *args = code[pc]
+        d = depth[pc]
+        if d == None or cmd in translate.CONTROL or cmd == 'update': break
+        elif cmd == 'pop': tainted.discard(d - 1)
+        elif cmd == 'popn': tainted.difference_update(range(d - args[0], d))
+        elif cmd == 'putfast':
+            if d - 1 in tainted: tainted.add(args[0])
+            else: tainted.discard(args[0])
+        elif cmd == 'loadfast':
+            if args[0] in tainted: tainted.add(d)
+        elif cmd == 'clrfast': tainted.discard(args[0])
+        elif cmd == 'apicall':
+            if d - 1 in tainted: break
+            calls.append(pc)
+        elif tainted.intersection(range(d - consumes(code[pc]), d)): break
+    else: pc = len(code)
+    return pc, calls
+
+def analyze(code):
+    ans = getattr(code, 'speculation', None)
+    if ans == None:
+        ans = {}
+        try: depth = translate.depths(code)
+        except translate.TranslationError: depth = None
+        if depth != None:
+            for pc, instr in enumerate(code):
+                if instr[0] == 'apicall' and depth[pc] != None:
+                    end, calls = region(code, depth, pc)
+                    if calls: ans[pc] = end
+        try: code.speculation = ans
+        except AttributeError: pass
+    return ans
+
+_executor = None
+
+def default_executor():
+    global _executor
+    if _executor == None: _executor = concurrent.futures.ThreadPoolExecutor(8)
+    return _executor
+
+def resolve(code, stack, pending):
+    for p in pending:
+        value = runtime.outer_to_value(p.result(code))
+        for i, v in enumerate(stack):
+            if v is p: stack[i] = runtime.copy(value, (stack, i))
+
+def speculate(code, plain, stack, pc, end, ticks, rpc, executor, checked):
+    pending = []
+    try:
+        while pc < end:
+            if pc < 0:
+                pc = -2 - pc
+                pending.append(Pending(executor.submit(rpc, code[pc][1], runtime.vkcell_to_outer(stack.pop())), pc))
+                stack.append(pending[-1])
+                pc += 1
+                continue
+            ticks += 1
+            if checked: runtime.check(stack)
+            cmd, arg = plain[pc]
+            pc = cmd(stack, arg, pc)
+    except Exception as e:
+        for p in pending: p.result(code)
+        if isinstance(e, runtime.VKRuntimeError) and e.pc == None: e.pc = pc
+        raise
+    resolve(code, stack, pending)
+    return ticks
+
+def execute(code, args=None, rpc=runtime.NoAPI, checked=None, executor=None, convert=runtime.vkcell_to_outer):
+    if args == None: args = {}
+    if checked == None: checked = runtime.CHECKED
+    if executor == None: executor = default_executor()
+    regions = analyze(code)
+    prog = runtime.prepared(code)
+    stack = []
+    stack.append(runtime.outer_to_value(args, (stack, 0)))
+    try: return convert(run(code, prog, regions, stack, rpc, checked, executor))
+    except runtime.VKRuntimeError as e: raise runtime.locate(e, code)
+
+def run(code, prog, regions, stack, rpc, checked, executor):
+    inner = runtime.run_checked if checked else runtime.run
+    # calls that start a region are speculated here, the rest go back to runtime.resume
+    def loop(prog, stack, pc, ticks):
+        while True:
+            pc, ticks = inner(prog, stack, pc, ticks)
+            if pc == -1: return pc, ticks
+            end = regions.get(-2 - pc)
+            if end == None or ticks + end - (-2 - pc) - 1 > runtime.LIMIT: return pc, ticks
+            ticks = speculate(code, prog[1], stack, pc, end, ticks, rpc, executor, checked)
+            pc = end
+    return runtime.resume(code, prog, stack, 0, 0, rpc, loop)
@@ -0,0 +1,232 @@
+import vkscript.runtime as runtime
+
+class TranslationError(Exception): pass
+
+class Bail(Exception):
+    def __init__(self, pc, ticks, stack, frame):
+        self.pc = pc
+        self.ticks = ticks
+        self.stack = stack
+        self.frame = frame
+
+CONTROL = ('and', 'or', 'pjif', 'goto', 'return')
+
+def effect(instr):
+    cmd = instr[0]
+    if cmd in ('pushc', 'loadfast'): return 1
+    elif cmd in ('binop', 'pop', 'arrayget', 'update', 'pjif'): return -1
+    elif cmd == 'popn': return -instr[1]
+    elif cmd == 'makearr': return 1 - instr[1]
+    elif cmd == 'makeobj': return 1 - len(instr[1])
+    elif cmd == 'methodcall': return 1 - instr[2]
+    else: return 0
+
+def depths(code):
+    ans = [None] * len(code)
+    stack = [(0, 1)]
+    while stack:
+        pc, d = stack.pop()
+        if pc >= len(code): raise TranslationError('jump out of code')
+        if ans[pc] != None:
+            if ans[pc] != d: raise TranslationError('inconsistent stack depth at %d'%pc)
+            continue
+        ans[pc] = d
+        cmd = code[pc][0]
+        if cmd in ('and', 'or'): stack.extend(((code[pc][1], d), (pc + 1, d - 1)))
+        elif cmd in ('pjif', 'goto'): stack.append((code[pc][1], d + effect(code[pc])))
+        if cmd not in ('and', 'or', 'goto', 'return'): stack.append((pc + 1, d + effect(code[pc])))
+    return ans
+
+class Translator:
+    def __init__(self, code):
+        self.code = code
+        self.depth = depths(code)
+        self.names = {}
+        self.ns = {k: getattr(runtime, k) for k in ('VKObject', 'VKRuntimeError', 'box', 'truth', 'copy', 'get_attr', 'get_item', 'set_attr', 'del_attr', 'filter_attr', 'call_method', 'outer_to_value', 'vkcell_to_outer')}
+        self.ns['Bail'] = Bail
+        self.lines = []
+        self.pcs = []
+        self.pc = 0
+        self.alias = {}
+        self.backjumps = {}
+        leaders = {0}
+        for pc, instr in enumerate(code):
+            if instr[0] in CONTROL: leaders.add(pc + 1)
+            if instr[0] in CONTROL[:4]:
+                leaders.add(instr[1])
+                if instr[0] == 'goto' and instr[1] <= pc:
+                    self.backjumps[instr[1]] = max(pc, self.backjumps.get(instr[1], pc))
+        self.leaders = sorted(i for i in leaders if i < len(code))
+        self.blocklen = {j: k - j for j, k in zip(self.leaders, self.leaders[1:] + [len(code)])}
+    def name(self, value, prefix='K'):
+        key = (prefix,)+runtime.const_key(value) if not isinstance(value, list) else (prefix, tuple(value))
+        if key not in self.names:
+            self.names[key] = '%s%d'%(prefix, len(self.names))
+            self.ns[self.names[key]] = value
+        return self.names[key]
+    def emit(self, indent, line):
+        self.lines.append('    '*indent+line)
+        self.pcs.append(self.pc)
+    def stack(self, d):
+        return '('+''.join('s%d, '%i for i in range(d))+')'
+    def flush(self, indent):
+        for k, v in sorted(self.alias.items()):
+            self.emit(indent, 's%d = copy(s%d, (F, %d))'%(k, v, v))
+        self.alias.clear()
+    def value(self, i):
+        if i in self.alias: return 's%d'%self.alias.pop(i)
+        return 's%d'%i
+    def gen(self, lo, hi, follow, loop, indent, header=None):
+        code = self.code
+        pc = lo
+        start = len(self.lines)
+        while pc < hi:
+            self.pc = pc
+            d = self.depth[pc]
+            if d == None:
+                pc += 1
+                continue
+            if pc in self.backjumps and pc != header:
+                end = self.backjumps[pc]
+                if end >= hi: raise TranslationError('unstructured loop at %d'%pc)
+                self.flush(indent)
+                self.emit(indent, 'while True:')
+                self.gen(pc, end + 1, None, (pc, end + 1), indent + 1, pc)
+                pc = end + 1
+                continue
+            header = None
+            if pc in self.blocklen:
+                self.flush(indent)
+                n = self.blocklen[pc]
+                self.emit(indent, 't += %d'%n)
+                self.emit(indent, 'if t > LIMIT: raise Bail(%d, t - %d, %s, F)'%(pc, n, self.stack(d)))
+            cmd, *args = code[pc]
+            top = self.value(d - 1) if cmd == 'pjif' else 's%d'%(d - 1)
+            if cmd in CONTROL[:4]: self.flush(indent)
+            if cmd in ('goto', 'pjif'):
+                t = args[0]
+                cond = 'if not truth(%s): '%top if cmd == 'pjif' else ''
+                if loop != None and t == loop[0]: self.emit(indent, cond+'continue')
+                elif loop != None and t == loop[1]: self.emit(indent, cond+'break')
+                elif cmd == 'goto' and t > pc and (t == follow or t <= hi) and all(self.depth[i] == None for i in range(pc + 1, min(t, hi))):
+                    pc = min(t, hi)
+                    continue
+                elif cmd == 'pjif' and (pc < t <= hi or t == follow):
+                    self.emit(indent, 'if truth(%s):'%top)
+                    t = min(t, hi)
+                    if t - 1 > pc and code[t-1][0] == 'goto' and t <= code[t-1][1] <= hi and code[t-1][1] != t:
+                        join = code[t-1][1]
+                        self.gen(pc + 1, t, join, loop, indent + 1)
+                        self.emit(indent, 'else:')
+                        self.gen(t, join, join, loop, indent + 1)
+                        pc = join
+                    else:
+                        self.gen(pc + 1, t, t if t < hi else follow, loop, indent + 1)
+                        pc = t
+                    continue
+                else: raise TranslationError('unstructured jump at %d'%pc)
+                pc += 1
+                continue
+            elif cmd in ('and', 'or'):
+                t = args[0]
+                if not pc < t <= hi: raise TranslationError('unstructured jump at %d'%pc)
+                self.emit(indent, 'if %struth(%s):'%('' if cmd == 'and' else 'not ', top))
+                self.gen(pc + 1, t, t, loop, indent + 1)
+                pc = t
+                continue
+            self.instr(indent, d, cmd, args)
+            pc += 1
+        self.flush(indent)
+        if len(self.lines) == start: self.emit(indent, 'pass')
+    def instr(self, indent, d, cmd, args):
+        s = lambda i: 's%d'%(d - i)
+        emit = lambda line: self.emit(indent, line)
+        if cmd == 'loadfast':
+            self.alias[d] = args[0]
+            return
+        elif cmd == 'return':
+            emit('return %s'%self.value(d - 1))
+            return
+        elif cmd == 'binop':
+            b = self.value(d - 1)
+            emit('%s = %s(%s, %s)'%(s(2), self.name(runtime.binops[args[0]], 'O'), self.value(d - 2), b))
+            return
+        elif cmd == 'unaryop':
+            emit('%s = %s(%s)'%(s(1), self.name(runtime.unaryops[args[0]], 'O'), self.value(d - 1)))
+            return
+        elif cmd != 'pushc': self.flush(indent)
+        if cmd in ('pop', 'popn'): pass
+        elif cmd == 'pushc': emit('%s = %s'%(s(0), self.name(runtime.outer_to_value(args[0]))))
+        elif cmd == 'makearr':
+            n = args[0]
+            emit('s%d = VKObject(None, array=map(box, %s))'%(d - n, '('+''.join('s%d, '%i for i in range(d - n, d))+')'))
+        elif cmd == 'makeobj':
+            n = len(args[0])
+            emit('s%d = VKObject(None, zip(%s, map(box, %s)))'%(d - n, self.name(args[0]), '('+''.join('s%d, '%i for i in range(d - n, d))+')'))
+        elif cmd == 'apicall': emit('%s = outer_to_value(rpc(%s, vkcell_to_outer(%s)))'%(s(1), self.name(args[0]), s(1)))
+        elif cmd == 'methodcall':
+            name, n = 'method_'+args[0], args[1]
+            this = s(n + 1)
+            emit('%s, s%d = call_method(%s, %s, (%s))'%(this, d - n, this, self.name(name), ''.join('s%d, '%i for i in range(d - n, d))))
+        elif cmd == 'arrayget': emit('%s = get_item(%s, %s)'%(s(2), s(2), s(1)))
+        elif cmd == 'attrget': emit('%s = get_attr(%s, %s)'%(s(1), s(1), self.name(args[0])))
+        elif cmd == 'attrset':
+            emit('%s, %s = %s, set_attr(%s, %s, %s)'%(s(2), s(1), s(1), s(2), self.name(args[0]), s(1)))
+            emit('if isinstance(%s, VKObject): %s.parent = (%s, %s)'%(s(2), s(2), s(1), self.name(args[0])))
+        elif cmd == 'delattr': emit('%s = del_attr(%s, %s)'%(s(1), s(1), self.name(args[0])))
+        elif cmd == 'update':
+            emit('p = getattr(%s, \'parent\', None)'%s(1))
+            emit('if p != None and p[0] is F:')
+            for i in range(d - 1):
+                self.emit(indent + 1, '%sif p[1] == %d: s%d = %s'%('el' if i else '', i, i, s(1)))
+            if d == 1: self.emit(indent + 1, 'pass')
+            emit('elif p != None: %s.op_update()'%s(1))
+        elif cmd == 'attrfilter': emit('%s = filter_attr(%s, %s)'%(s(1), s(1), self.name(args[0])))
+        elif cmd == 'putfast': emit('s%d = copy(%s, (F, %d))'%(args[0], s(1), args[0]))
+        elif cmd == 'clrfast': emit('s%d = None'%args[0])
+        else: raise TranslationError('unknown command: '+cmd)
+    def translate(self):
+        self.emit(0, 'def main(args, rpc, LIMIT):')
+        self.emit(1, 'F = []')
+        self.emit(1, 's0 = outer_to_value(args, (F, 0))')
+        self.emit(1, 't = 0')
+        self.gen(0, len(self.code), None, None, 1)
+        src = '\n'.join(self.lines)+'\n'
+        try: exec(compile(src, '<vkscript>', 'exec'), self.ns)
+        except (SyntaxError, RecursionError, MemoryError) as e: raise TranslationError(str(e))
+        main = self.ns['main']
+        main.source = src
+        main.pcs = self.pcs
+        return main
+
+def translate(code):
+    if not code or code[-1][0] not in ('return', 'goto'): raise TranslationError('code falls off the end')
+    return Translator(code).translate()
+
+def translated(code):
+    ans = getattr(code, 'translated', None)
+    if ans == None:
+        try: ans = translate(code)
+        except TranslationError: ans = False
+        try: code.translated = ans
+        except AttributeError: pass
+    return ans
+
+def execute(code, args=None, rpc=runtime.NoAPI, checked=None, convert=runtime.vkcell_to_outer):
+    if args == None: args = {}
+    if checked == None: checked = runtime.CHECKED
+    main = None if checked else translated(code)
+    if not main: return runtime.execute(code, args, rpc, checked, convert=convert)
+    try:
+        try: ans = main(args, rpc, runtime.LIMIT)
+        except Bail as e:
+            stack = list(e.stack)
+            for i, v in enumerate(stack):
+                if isinstance(v, runtime.VKObject) and v.parent != None and v.parent[0] is e.frame:
+                    v.parent = (stack, v.parent[1])
+            ans = runtime.resume(code, runtime.prepared(code), stack, e.pc, e.ticks, rpc, runtime.run)
+    except runtime.VKRuntimeError as e:
+        tb = e.__traceback__
+        while tb != None and tb.tb_frame.f_code is not main.__code__: tb = tb.tb_next
+        raise runtime.locate(e, code, main.pcs[tb.tb_lineno - 1] if tb != None else None)
+    return convert(ans)